@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# ELM11 Batch Analysis
+# Offline FFT analysis of recorded signals without the interactive menus
+# Recordings are streamed in blocks so file length does not affect memory use
+
+import argparse
+import os
+import sys
+import wave
+
+import numpy as np
+
+from shim_interface import SpectrumAccumulator, SAMPLE_RATE, FFT_SIZE
+from spectrum_publisher import find_peaks
+from multirate import ZoomAnalyzer
+from fft_config import next_fast_len
+from harmonics import HarmonicAnalyzer
+from result_cache import ResultCache, CACHE_DIR, cache_key, code_version, file_digest
+
+# Batch configuration
+BLOCK_SIZE = 65536   # Samples read from a recording per update
+N_PEAKS = 5
+
+# Summaries are recomputed when any of the analysis code changes
+_HERE = os.path.dirname(os.path.abspath(__file__))
+ANALYSIS_SOURCES = tuple(os.path.join(_HERE, name) for name in
+                         ('batch_analysis.py', 'shim_interface.py', 'multirate.py',
+                          'harmonics.py', 'fft_config.py'))
+
+
+def read_blocks(path, block_size=BLOCK_SIZE):
+    """Yield (sample_rate, block) pairs from a .wav, .npy or text recording.
+
+    sample_rate is None when the file format does not record it.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.wav':
+        with wave.open(path, 'rb') as w:
+            if w.getsampwidth() != 2:
+                raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+            channels = w.getnchannels()
+            while True:
+                frames = w.readframes(block_size)
+                if not frames:
+                    break
+                pcm = np.frombuffer(frames, dtype='<i2').reshape(-1, channels)
+                yield w.getframerate(), pcm[:, 0] / 32768.0
+    elif ext == '.npy':
+        data = np.load(path, mmap_mode='r')
+        for i in range(0, len(data), block_size):
+            yield None, np.asarray(data[i:i + block_size], dtype=np.float64)
+    else:
+        # One sample per line (first column of CSV files)
+        with open(path) as f:
+            block = []
+            started = False
+            for line in f:
+                line = line.split(',')[0].strip()
+                if not line:
+                    continue
+                try:
+                    block.append(float(line))
+                except ValueError:
+                    if started:
+                        raise ValueError(f"{path}: not a sample value: {line!r}") from None
+                    continue  # Header or comment lines before the first sample
+                started = True
+                if len(block) == block_size:
+                    yield None, np.array(block)
+                    block = []
+            if block:
+                yield None, np.array(block)
+
+
+def analyze_file(path, args):
+    """Accumulate a whole recording and return the accumulator snapshot.
+
+    With args.harmonics the snapshot also holds per-frame fundamental, THD,
+    THD+N and SINAD arrays, measured on consecutive fft_size-sample frames.
+    """
+    accumulator = None
+    harmonics = None
+    tail = np.zeros(0)
+    measurements = []
+    for file_rate, block in read_blocks(path):
+        if accumulator is None:
+            rate = file_rate or args.sample_rate
+            if args.zoom:
+                center, span = args.zoom
+                accumulator = ZoomAnalyzer(center, span, rate, args.fft_size)
+            else:
+                accumulator = SpectrumAccumulator(args.fft_size, rate,
+                                                  args.overlap, args.ema_alpha)
+            if args.harmonics:
+                harmonics = HarmonicAnalyzer(args.fft_size, rate)
+        accumulator.update(block)
+
+        if harmonics is not None:
+            # Every whole frame in the block is measured in one call
+            data = np.concatenate([tail, block])
+            n_frames = len(data) // args.fft_size
+            tail = data[n_frames * args.fft_size:]
+            if n_frames:
+                measurements.append(harmonics.analyze(
+                    data[:n_frames * args.fft_size].reshape(n_frames, args.fft_size)))
+    if accumulator is None:
+        raise ValueError(f"{path}: no samples")
+
+    summary = accumulator.snapshot()
+    if measurements:
+        for name in ('fundamental', 'thd', 'thd_n', 'sinad'):
+            summary[name] = np.concatenate([m[name] for m in measurements])
+    return summary
+
+
+def cached_analysis(path, args, cache):
+    """analyze_file(), skipped when the recording and settings are unchanged"""
+    if cache is None:
+        return analyze_file(path, args)
+    settings = {'sample_rate': args.sample_rate, 'fft_size': args.fft_size,
+                'overlap': args.overlap, 'ema_alpha': args.ema_alpha, 'zoom': args.zoom,
+                'harmonics': args.harmonics}
+    key = cache_key(file_digest(path), settings, code_version(*ANALYSIS_SOURCES))
+    return cache.get_or_compute(key, lambda: analyze_file(path, args))
+
+
+def print_zoom_summary(path, summary):
+    freqs = summary['freqs']
+    magnitude = summary['magnitude']
+    print(f"{path}: {summary['segments']} zoom segments, "
+          f"{summary['resolution']:.3f} Hz resolution, {freqs[0]:.1f}-{freqs[-1]:.1f} Hz")
+    if not summary['segments']:
+        # One segment is fft_size samples after decimation to the span
+        print(f"  Warning: recording too short for a zoom segment (needs about "
+              f"{1 / summary['resolution']:.1f} s); use a wider span or a smaller --fft-size")
+        return
+    for freq, mag in find_peaks(magnitude, freqs[1] - freqs[0], N_PEAKS):
+        print(f"  {freqs[0] + freq:10.2f} Hz  amplitude {mag:.4f}")
+
+
+def print_harmonic_summary(summary):
+    fundamental = summary['fundamental']
+    thd = summary['thd'] * 100
+    thd_n = summary['thd_n'] * 100
+    print(f"  {len(thd)} frames, fundamental {np.nanmedian(fundamental):.2f} Hz (median)")
+    print(f"  THD   {np.mean(thd):.4f}% mean, {np.max(thd):.4f}% max")
+    print(f"  THD+N {np.mean(thd_n):.4f}% mean, {np.max(thd_n):.4f}% max")
+    print(f"  SINAD {np.mean(summary['sinad']):.1f} dB mean, {np.min(summary['sinad']):.1f} dB min")
+
+
+def parse_zoom(text):
+    """CENTER:SPAN in Hz"""
+    center, _, span = text.partition(':')
+    try:
+        return float(center), float(span or 100)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected CENTER:SPAN, got {text!r}")
+
+
+def parse_alpha(text):
+    """EMA weight of the newest segment, 0 < alpha <= 1"""
+    try:
+        alpha = float(text)
+    except ValueError:
+        alpha = None
+    if alpha is None or not 0 < alpha <= 1:
+        raise argparse.ArgumentTypeError(f"expected a value in (0, 1], got {text!r}")
+    return alpha
+
+
+def print_summary(path, summary):
+    psd = summary['psd']
+    freqs = summary['freqs']
+    bin_hz = freqs[1] - freqs[0]
+    print(f"{path}: {summary['segments']} segments, {bin_hz:.2f} Hz resolution")
+    for freq, _ in find_peaks(psd, bin_hz, N_PEAKS):
+        idx = int(round(freq / bin_hz))
+        print(f"  {freqs[idx]:10.1f} Hz  {10 * np.log10(psd[idx] + 1e-20):7.1f} dB/Hz  "
+              f"(peak-hold {10 * np.log10(summary['peak_hold'][idx] + 1e-20):.1f} dB/Hz)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch FFT analysis of recorded signals")
+    parser.add_argument('recordings', nargs='+', help=".wav, .npy or text/CSV sample files")
+    parser.add_argument('--sample-rate', type=float, default=SAMPLE_RATE,
+                        help="Sample rate for formats that do not store one")
+    parser.add_argument('--fft-size', type=int, default=FFT_SIZE,
+                        help="Rounded up to the next 5-smooth length")
+    parser.add_argument('--overlap', type=float, default=0.5, help="Welch segment overlap (0-1)")
+    parser.add_argument('--ema-alpha', type=parse_alpha, default=0.1,
+                        help="Weight of the newest segment in the moving average (0-1]")
+    parser.add_argument('--zoom', type=parse_zoom, metavar='CENTER:SPAN',
+                        help="Zoom-FFT a narrow band instead of the full spectrum")
+    parser.add_argument('--harmonics', action='store_true',
+                        help="Measure fundamental, THD, THD+N and SINAD on every frame")
+    parser.add_argument('--output', help="Directory for per-recording .npz results")
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help="Result cache; unchanged recordings are not re-analyzed")
+    parser.add_argument('--no-cache', action='store_true', help="Always recompute")
+    args = parser.parse_args()
+    args.fft_size = next_fast_len(args.fft_size)
+    cache = None if args.no_cache else ResultCache(args.cache_dir)
+
+    failed = False
+    for path in args.recordings:
+        try:
+            summary = cached_analysis(path, args, cache)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            failed = True
+            continue
+
+        if args.zoom:
+            print_zoom_summary(path, summary)
+        else:
+            print_summary(path, summary)
+        if 'thd' in summary:
+            print_harmonic_summary(summary)
+        if args.output:
+            os.makedirs(args.output, exist_ok=True)
+            name = os.path.splitext(os.path.basename(path))[0] + '.npz'
+            np.savez(os.path.join(args.output, name), **summary)
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Cache: {stats['memory_hits'] + stats['disk_hits']} reused, "
+              f"{stats['misses']} analyzed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,12 @@ import glob
 import questionary
 import os
 
+import numpy as np
+
+import sample_codec
+import result_marshal
+from fft_config import load_config
+
 # Serial configuration
 SERIAL_PORTS = glob.glob('/dev/ttyUSB*') + glob.glob('/dev/ttyACM*')
 if not SERIAL_PORTS:
@@ -17,6 +23,40 @@ if not SERIAL_PORTS:
 BAUD_RATES = [115200, 9600, 19200, 38400, 57600]
 TIMEOUT = 2
 
+# FFT settings shared with the Lua code (fourier/config.lua)
+FFT_SETTINGS = load_config()
+SIGNAL_ARGS = f"{FFT_SETTINGS['SAMPLE_RATE']}, {FFT_SETTINGS['BUFFER_SIZE']}"
+
+# Upload configuration
+UPLOAD_RX_BUFFER = 256     # Conservative size of the ELM11 REPL input buffer
+UPLOAD_THRESHOLD = UPLOAD_RX_BUFFER - 64  # Longer code (or several lines) is staged in chunks
+UPLOAD_WINDOW = 2          # Chunk lines in flight before waiting for an echo
+UPLOAD_MIN_CHUNK = 32
+UPLOAD_LINE_TIME = 0.05    # Initial chunk is sized to take this long on the wire
+UPLOAD_ECHO_MARGIN = 0.2   # Extra seconds allowed for each echo
+UPLOAD_RETRIES = 5
+
+# Staged code runs inside a pcall; the run line checks the length and compiles it
+UPLOAD_WRAPPER = ('local ok, e = pcall(function(...) {code}\nend, ...)\n'
+                  'if not ok then print("Error: " .. tostring(e)) end')
+UPLOAD_RUN = ('do local s = table.concat(__upload, "", 1, {chunks}); __upload = nil; '
+              'local f, e = load(s, "=upload"); if #s ~= {size} then e = "upload length mismatch" '
+              'elseif f then f() end; if e then print("Error: " .. e) end end')
+
+# Helper modules required by fourier_main.lua, registered in package.preload
+DEVICE_MODULES = {
+    'config': 'fourier/config.lua',
+    'sample_codec': 'fourier/sample_codec.lua',
+    'result_marshal': 'fourier/result_marshal.lua',
+}
+
+# Lua string escapes for each byte value, used to embed chunks in REPL lines
+LUA_ESCAPES = [chr(b) if 32 <= b < 127 else f"\\{b:03d}" for b in range(256)]
+LUA_ESCAPES[ord('"')] = '\\"'
+LUA_ESCAPES[ord('\\')] = '\\\\'
+LUA_ESCAPES[ord('\n')] = '\\n'
+LUA_ESCAPES[ord('\t')] = '\\t'
+
 def connect_serial():
     """Connect to ELM11 serial port"""
     for port in SERIAL_PORTS:
@@ -52,23 +92,116 @@ def connect_serial():
     print("Failed to connect to ELM11")
     return None
 
-def send_lua_code(ser, code):
-    """Send Lua code to ELM11 and return response"""
+def _upload_line(data, start, index, chunk_size):
+    """Build one REPL line storing data[start:] (up to chunk_size escaped chars)"""
+    parts = []
+    length = 0
+    end = start
+    while end < len(data):
+        escaped = LUA_ESCAPES[data[end]]
+        if length + len(escaped) > chunk_size and parts:
+            break
+        parts.append(escaped)
+        length += len(escaped)
+        end += 1
+    return f'__upload[{index}]="{"".join(parts)}"', end
+
+def upload_lua_code(ser, code, window=UPLOAD_WINDOW, max_retries=UPLOAD_RETRIES):
+    """Stage code on the ELM11 in the global __upload table without running it
+
+    Each chunk is sent as an indexed assignment and confirmed by the REPL
+    echo. Chunk size starts from the baud rate, doubles while echoes come back
+    clean and halves on a mismatch; a bad echo resends from the failed chunk,
+    overwriting its index. Returns upload statistics, or None on failure.
+    """
+    data = code.encode()
+    bytes_per_sec = ser.baudrate / 10.0  # 8N1: 10 bits per byte
+    max_chunk = UPLOAD_RX_BUFFER // window - 24  # Leave room for the assignment
+    chunk_size = int(min(max_chunk, max(UPLOAD_MIN_CHUNK, bytes_per_sec * UPLOAD_LINE_TIME)))
+
+    old_timeout = ser.timeout
+    start_time = time.time()
+    wire_bytes = 0
+    retransmits = 0
+    failures = 0
+    in_flight = []  # (index, start, line) awaiting echo
+    index, pos = 1, 0
+
     try:
-        # Send code in chunks if it's very large
-        chunk_size = 1024
-        if len(code) > chunk_size:
-            # Send in chunks with small delays
-            for i in range(0, len(code), chunk_size):
-                chunk = code[i:i+chunk_size]
-                ser.write(chunk.encode())
-                ser.flush()
-                time.sleep(0.1)  # Small delay between chunks
-            ser.write(b'\r\n')  # Final newline
-            ser.flush()
-        else:
-            ser.write((code + '\r\n').encode())
+        ser.reset_input_buffer()
+        pending = [(0, 0, '__upload = {}')]
+        while True:
+            # Fill the window
+            while len(in_flight) + len(pending) < window and pos < len(data):
+                line, end = _upload_line(data, pos, index, chunk_size)
+                pending.append((index, pos, line))
+                index, pos = index + 1, end
+            for entry in pending:
+                ser.write((entry[2] + '\r\n').encode())
+                wire_bytes += len(entry[2]) + 2
+                in_flight.append(entry)
             ser.flush()
+            pending = []
+            if not in_flight:
+                break
+
+            # Wait for the oldest line's echo
+            line_index, line_start, line = in_flight[0]
+            ser.timeout = (len(line) + 2) * window / bytes_per_sec * 2 + UPLOAD_ECHO_MARGIN
+            echo = ser.read_until(b'\n')
+            if line.encode() in echo:
+                in_flight.pop(0)
+                failures = 0
+                chunk_size = min(max_chunk, chunk_size * 2)
+                continue
+
+            # Mismatch: shrink chunks and go back to the failed one
+            failures += 1
+            retransmits += 1
+            if failures > max_retries:
+                print(f"Upload failed: no clean echo for chunk {line_index}")
+                return None
+            time.sleep(ser.timeout)
+            ser.reset_input_buffer()
+            in_flight = []
+            chunk_size = max(UPLOAD_MIN_CHUNK, chunk_size // 2)
+            if line_index == 0:
+                pending = [(0, 0, line)]
+                index, pos = 1, 0
+            else:
+                index, pos = line_index, line_start
+    finally:
+        ser.timeout = old_timeout
+
+    elapsed = max(time.time() - start_time, 1e-6)
+    stats = {
+        'bytes': len(data),
+        'chunks': index - 1,
+        'seconds': elapsed,
+        'throughput': len(data) / elapsed,
+        'line_utilization': wire_bytes / elapsed / bytes_per_sec,
+        'retransmits': retransmits,
+    }
+    print(f"Uploaded {stats['bytes']} bytes in {elapsed:.2f}s "
+          f"({stats['throughput']:.0f} B/s, {stats['line_utilization']:.0%} of line rate, "
+          f"{retransmits} retransmits)")
+    return stats
+
+def send_lua_code(ser, code, force_upload=False):
+    """Send Lua code to ELM11 and return response"""
+    try:
+        staged = force_upload or len(code) > UPLOAD_THRESHOLD or '\n' in code
+        if staged:
+            # Stage the code with verified chunks, then run it with one short line.
+            # Runtime errors are caught inside the staged code, keeping that line
+            # well under UPLOAD_RX_BUFFER.
+            stats = upload_lua_code(ser, UPLOAD_WRAPPER.format(code=code))
+            if stats is None:
+                return "Error: upload failed"
+            code = UPLOAD_RUN.format(chunks=stats['chunks'], size=stats['bytes'])
+
+        ser.write((code + '\r\n').encode())
+        ser.flush()
 
         # Wait longer for large code blocks
         wait_time = min(2.0, 0.5 + len(code) / 2000)  # Scale wait time with code size
@@ -83,13 +216,119 @@ def send_lua_code(ser, code):
             response += chunk
             time.sleep(0.1)
 
-        return response.decode(errors='replace')
+        # Drop the REPL's echo of the command, so only its output is checked
+        return response.decode(errors='replace').replace(code, '', 1)
     except Exception as e:
         return f"Error: {e}"
 
+def read_sample_stream(ser, n_samples):
+    """Read compressed ADC blocks from the ELM11 and return them as a -1..1 signal.
+
+    Bytes before the first valid block header (REPL echo, or the tail of a
+    block already in flight) are skipped one at a time.
+    """
+    header_size = sample_codec.BLOCK_HEADER.size
+    data = b""
+    decoded = 0
+    skipped = 0
+    header = b""
+    start = time.time()
+    while decoded < n_samples:
+        chunk = ser.read(header_size - len(header))
+        if not chunk:
+            break  # Timed out
+        header += chunk
+        if len(header) < header_size:
+            continue
+        mode, width, count, length = sample_codec.BLOCK_HEADER.unpack(header)
+        if not sample_codec.valid_header(mode, width, count, length):
+            header = header[1:]
+            skipped += 1
+            continue
+        payload = ser.read(length)
+        if len(payload) < length:
+            break
+        data += header + payload
+        decoded += count
+        header = b""
+    elapsed = time.time() - start
+    if skipped:
+        print(f"Skipped {skipped} bytes before the first block")
+
+    codes = sample_codec.decode(data)
+    if elapsed > 0 and len(codes):
+        print(f"Received {len(codes)} samples in {len(data)} bytes "
+              f"({len(codes) / elapsed:.0f} samples/s, "
+              f"{len(codes) * 1.5 / max(len(data), 1):.2f}x compression)")
+    return sample_codec.to_signal(codes[:n_samples])
+
+def run_sample_capture(ser):
+    """Turn on compressed sample streaming and read a capture from the ADC"""
+    print("Sample Stream Capture")
+    print("=" * 40)
+    n_samples = int(questionary.text("Samples to capture:",
+                                     default=str(FFT_SETTINGS['BUFFER_SIZE'] * 8)).ask())
+
+    # The sentinel is built on the device, so an unstripped echo cannot match it
+    response = send_lua_code(ser, 'local m = package.loaded.fourier_main; '
+                                  'if m then m.set_streaming(true) '
+                                  'else print("NOT" .. "_LOADED") end')
+    if "NOT_LOADED" in response or response.startswith("Error"):
+        print("Load the FFT code first (Load FFT Code)")
+        return None
+
+    ser.reset_input_buffer()
+    try:
+        signal = read_sample_stream(ser, n_samples)
+    finally:
+        send_lua_code(ser, 'package.loaded.fourier_main.set_streaming(false)')
+        ser.reset_input_buffer()
+
+    if len(signal) == 0:
+        print("No samples received (is an ADC module present on the ELM11?)")
+    else:
+        spectrum = np.abs(np.fft.rfft(signal - np.mean(signal)))
+        peak_hz = np.argmax(spectrum) * FFT_SETTINGS['SAMPLE_RATE'] / len(signal)
+        print(f"Captured {len(signal)} samples, range {signal.min():.3f} to {signal.max():.3f}, "
+              f"peak at {peak_hz:.1f} Hz")
+    input("Press Enter to return to main menu...")
+    return signal
+
+def read_lua_results(ser):
+    """Fetch current_signal, fft_result and fourier_coeffs from the ELM11 as NumPy arrays"""
+    ser.reset_input_buffer()
+    ser.write(b'local m = require("result_marshal"); io.write(m.pack_state("f", m.main_state()))\r\n')
+    ser.flush()
+    results = result_marshal.read_stream(ser.read)
+    if results is None:
+        print("No result data received from ELM11")
+    return results
+
+def load_lua_modules(ser):
+    """Register the helper modules so fourier_main.lua can require() them"""
+    for name, path in DEVICE_MODULES.items():
+        try:
+            with open(path, 'r') as f:
+                module_code = f.read()
+        except FileNotFoundError:
+            print(f"Error: {path} not found")
+            return False
+
+        print(f"Sending module {name}...")
+        wrapped = f'package.preload["{name}"] = function(...)\n{module_code}\nend'
+        response = send_lua_code(ser, wrapped, force_upload=True)
+        if "Error" in response:
+            print(f"Failed to load module {name}:")
+            print(response)
+            return False
+    return True
+
 def load_fft_lua_code(ser):
     """Load the FFT Lua code onto ELM11"""
     print("Loading FFT Lua code onto ELM11...")
+    if not load_lua_modules(ser):
+        return False
+
     try:
         with open('fourier/fourier_main.lua', 'r') as f:
             lua_code = f.read()
@@ -128,6 +367,12 @@ def run_fft_analysis(ser):
     print("Analysis response:")
     print(response)
 
+    results = read_lua_results(ser)
+    if results and 'fft_result' in results:
+        magnitudes = np.abs(results['fft_result'])
+        print(f"Received {len(results['current_signal'])} samples and "
+              f"{len(magnitudes)} FFT bins; peak at bin {np.argmax(magnitudes)}")
+
     print("")
     input("Press Enter to return to main menu...")
 
@@ -137,10 +382,10 @@ def run_signal_generation(ser):
     print("=" * 40)
 
     signal_types = {
-        "Sine Wave": "generate_sine(440, 1.0, 48000, 1024)",
-        "Square Wave": "generate_square(440, 1.0, 48000, 1024)",
-        "Sawtooth Wave": "generate_sawtooth(440, 1.0, 48000, 1024)",
-        "Triangle Wave": "generate_triangle(440, 1.0, 48000, 1024)",
+        "Sine Wave": f"generate_sine(440, 1.0, {SIGNAL_ARGS})",
+        "Square Wave": f"generate_square(440, 1.0, {SIGNAL_ARGS})",
+        "Sawtooth Wave": f"generate_sawtooth(440, 1.0, {SIGNAL_ARGS})",
+        "Triangle Wave": f"generate_triangle(440, 1.0, {SIGNAL_ARGS})",
         "Custom Waveform": "generate_custom()"
     }
 
@@ -207,7 +452,8 @@ def run_lua_interactive(ser):
     """Interactive Lua code runner on ELM11 - FFT focused"""
     examples = {
         "Load FFT Library": 'require("fft")',
-        "Generate Sine Wave": 'local signal = {}; for i=1,1024 do signal[i] = math.sin(2*math.pi*440*i/48000) end',
+        "Generate Sine Wave": (f'local signal = {{}}; for i=1,{FFT_SETTINGS["BUFFER_SIZE"]} do '
+                               f'signal[i] = math.sin(2*math.pi*440*i/{FFT_SETTINGS["SAMPLE_RATE"]}) end'),
         "Compute FFT": 'local spectrum = fft.analyze(signal)',
         "Extract Magnitudes": 'local mag = {}; for i=1,#spectrum/2 do mag[i] = math.sqrt(spectrum[i*2-1]^2 + spectrum[i*2]^2) end',
         "Find Peak Frequency": 'local peak_idx = 1; for i=2,#mag do if mag[i] > mag[peak_idx] then peak_idx = i end end; print("Peak at bin:", peak_idx)',
@@ -341,6 +587,7 @@ def main():
                 "Signal Generation",
                 "Fourier Series Demo",
                 "Real-time FFT",
+                "Capture Sample Stream",
                 "Interactive Lua (FFT)",
                 "Enter Command Mode",
                 "Show Boot Log",
@@ -357,6 +604,8 @@ def main():
             run_fourier_series_demo(ser)
         elif choice == "Real-time FFT":
             run_real_time_fft(ser)
+        elif choice == "Capture Sample Stream":
+            run_sample_capture(ser)
         elif choice == "Interactive Lua (FFT)":
             run_lua_interactive(ser)
         elif choice == "Enter Command Mode":
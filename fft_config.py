@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# ELM11 FFT Configuration
+# Loads the shared settings in fourier/config.lua and picks efficient FFT lengths
+
+import os
+import re
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fourier', 'config.lua')
+
+# Used when fourier/config.lua is missing or leaves a value out
+DEFAULTS = {
+    'SAMPLE_RATE': 48000,
+    'BUFFER_SIZE': 1024,
+    'FFT_SIZE': 1024,
+    'MULTIRES_SIZES': [256, 4096],
+}
+
+CONFIG_LINE = re.compile(r'^\s*([A-Z_][A-Z0-9_]*)\s*=\s*([^,]+?|\{[^}]*\})\s*,?\s*(--.*)?$')
+
+
+def _parse_value(text):
+    if text.startswith('{'):
+        return [_parse_value(v.strip()) for v in text[1:-1].split(',') if v.strip()]
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def load_config(path=CONFIG_FILE):
+    """Read NAME = value entries from the Lua config table"""
+    config = dict(DEFAULTS)
+    try:
+        with open(path) as f:
+            for line in f:
+                match = CONFIG_LINE.match(line)
+                if match:
+                    config[match.group(1)] = _parse_value(match.group(2))
+    except FileNotFoundError:
+        pass
+    return config
+
+
+def is_fast_len(n):
+    """True if n has no prime factors above 5"""
+    for p in (2, 3, 5):
+        while n % p == 0:
+            n //= p
+    return n == 1
+
+
+def next_fast_len(n):
+    """Smallest 5-smooth length >= n (FFTs of these sizes are fastest)"""
+    n = max(1, int(n))
+    while not is_fast_len(n):
+        n += 1
+    return n
+
+
+class FFTConfig:
+    """Sample rate, buffer size and FFT size for one analyzer.
+
+    Values not given are taken from fourier/config.lua. The FFT size is
+    rounded up to a 5-smooth length; when it is longer than the buffer the
+    buffer is zero-padded, and it is never shorter (no truncation).
+    """
+
+    def __init__(self, sample_rate=None, buffer_size=None, fft_size=None, multires_sizes=None):
+        shared = load_config()
+        self.sample_rate = sample_rate or shared['SAMPLE_RATE']
+        self.buffer_size = int(buffer_size or shared['BUFFER_SIZE'])
+        requested = shared['FFT_SIZE'] if fft_size is None else fft_size
+        self.fft_size = next_fast_len(max(requested or 0, self.buffer_size))
+        self.multires_sizes = [next_fast_len(s) for s in
+                               (multires_sizes or shared['MULTIRES_SIZES'])]
+
+    @property
+    def bin_hz(self):
+        return self.sample_rate / self.fft_size
+
+    def __repr__(self):
+        return (f"FFTConfig(sample_rate={self.sample_rate}, buffer_size={self.buffer_size}, "
+                f"fft_size={self.fft_size}, multires_sizes={self.multires_sizes})")
@@ -0,0 +1,31 @@
+-- ELM11 Sample Codec Fixture
+-- Regenerates sample_codec_lua.bin with the device encoder (fourier/sample_codec.lua)
+-- Run from the repository root: lua fixtures/make_sample_codec_fixture.lua
+-- The codes must match fixture_codes() in sample_codec.py
+
+package.path = "fourier/?.lua;" .. package.path
+local codec = require("sample_codec")
+
+local codes = {}
+
+-- Triangle: small deltas, delta coded
+for i = 0, 255 do
+    codes[#codes+1] = 2048 + 6 * math.min(i, 256 - i)
+end
+
+-- LCG noise: residuals larger than 12 bits, raw fallback
+local x = 12345
+for _ = 1, 256 do
+    x = (1103515245 * x + 12345) % 2147483648
+    codes[#codes+1] = (x >> 16) & 0xFFF
+end
+
+-- Short ramp: partial final block
+for i = 0, 99 do
+    codes[#codes+1] = 100 + 3 * i
+end
+
+local f = assert(io.open("fixtures/sample_codec_lua.bin", "wb"))
+f:write(codec.encode(codes))
+f:close()
+print(string.format("Wrote %d samples", #codes))
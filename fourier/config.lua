@@ -0,0 +1,31 @@
+-- ELM11 FFT Configuration
+-- Single source for the device code and the PC tools (read by fft_config.py)
+-- Keep to simple NAME = value lines so both sides can parse it
+
+local config = {
+    SAMPLE_RATE = 48000,
+    BUFFER_SIZE = 1024,
+    FFT_SIZE = 1024,                  -- Rounded up to a 5-smooth length >= BUFFER_SIZE
+    MULTIRES_SIZES = {256, 4096},     -- Short FFTs for transients, long for tonal detail
+}
+
+-- Smallest length >= n with no prime factors above 5 (as fft_config.next_fast_len)
+local function next_fast_len(n)
+    n = math.max(1, math.floor(n))
+    while true do
+        local m = n
+        for _, p in ipairs({2, 3, 5}) do
+            while m % p == 0 do m = m // p end
+        end
+        if m == 1 then return n end
+        n = n + 1
+    end
+end
+
+-- Same sizes the PC tools use (fft_config.FFTConfig)
+config.FFT_SIZE = next_fast_len(math.max(config.FFT_SIZE, config.BUFFER_SIZE))
+for i, size in ipairs(config.MULTIRES_SIZES) do
+    config.MULTIRES_SIZES[i] = next_fast_len(size)
+end
+
+return config
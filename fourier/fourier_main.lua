@@ -6,11 +6,15 @@
 local fft = require("fft")
 local signal = require("signal.generator")
 local visualization = require("visualization")
+local codec = require("sample_codec")
 
--- Configuration
-local SAMPLE_RATE = 48000
-local BUFFER_SIZE = 1024
-local FFT_SIZE = 512
+-- Configuration (shared with the PC tools, see config.lua)
+local config = require("config")
+local SAMPLE_RATE = config.SAMPLE_RATE
+local BUFFER_SIZE = config.BUFFER_SIZE
+local FFT_SIZE = config.FFT_SIZE
+local STREAM_SAMPLES = false  -- Send compressed ADC codes to the PC (see set_streaming)
+local FRAME_PERIOD = BUFFER_SIZE / SAMPLE_RATE  -- One frame per acquired buffer
 
 -- Global state
 local current_signal = {}
@@ -18,6 +22,9 @@ local fft_result = {}
 local fourier_coeffs = {}
 local display_mode = "time"  -- "time", "freq", "waterfall", "fourier"
 
+-- Frame clock: deadline accounting and render skipping under overload
+local frame_clock = {deadline = nil, frames = 0, misses = 0, skipped = 0, skip_render = false}
+
 -- Initialize hardware
 function love.load()
     -- Set up display
@@ -39,25 +46,53 @@ end
 
 -- Main update loop
 function love.update(dt)
+    local frame_start = love.timer.getTime()
+
     -- Read sensor data if available
     if pcall(require, "adc") then
         local adc = require("adc")
+        local codes = {}
         -- Read ADC values into current_signal buffer
         for i = 1, BUFFER_SIZE do
-            current_signal[i] = adc.read(1) / 4096.0 * 2.0 - 1.0  -- Normalize to -1..1
-            love.timer.sleep(1/SAMPLE_RATE)  -- Maintain sample rate
+            codes[i] = adc.read(1)
+            current_signal[i] = codes[i] / 4096.0 * 2.0 - 1.0  -- Normalize to -1..1
+            -- Maintain sample rate against the frame start, so sleep errors don't accumulate
+            local wait = frame_start + i / SAMPLE_RATE - love.timer.getTime()
+            if wait > 0 then love.timer.sleep(wait) end
+        end
+
+        -- Stream the raw codes to the PC (decoded by sample_codec.py)
+        if STREAM_SAMPLES then
+            io.write(codec.encode(codes))
+            io.flush()
         end
     end
 
+    -- Analysis and drawing must finish before the next buffer is complete
+    frame_clock.deadline = love.timer.getTime() + FRAME_PERIOD
+
     -- Perform FFT analysis
     fft_result = fft.analyze(current_signal)
 
     -- Extract Fourier series coefficients
     fourier_coeffs = fft.get_fourier_series(fft_result, 10)
+
+    -- Skip the next draw if analysis already ran past this frame's deadline
+    frame_clock.frames = frame_clock.frames + 1
+    local late = love.timer.getTime() - frame_clock.deadline
+    frame_clock.skip_render = late > 0
+    if late > 0 then
+        frame_clock.misses = frame_clock.misses + 1
+    end
 end
 
 -- Main draw function
 function love.draw()
+    if frame_clock.skip_render then
+        frame_clock.skipped = frame_clock.skipped + 1
+        return
+    end
+
     love.graphics.clear(0.1, 0.1, 0.1)  -- Dark background
 
     if display_mode == "time" then
@@ -77,6 +112,8 @@ function love.draw()
     love.graphics.setColor(1, 1, 1)
     love.graphics.print(string.format("FPS: %.1f", love.timer.getFPS()), 10, 10)
     love.graphics.print(string.format("Mode: %s", display_mode), 10, 30)
+    love.graphics.print(string.format("Deadline misses: %d/%d, skipped draws: %d",
+        frame_clock.misses, frame_clock.frames, frame_clock.skipped), 10, 50)
 end
 
 -- Draw time domain signal
@@ -219,11 +256,18 @@ function generate_square(freq, amp, sample_rate, samples)
 end
 
 -- Export functions for external use
-return {
+local exports = {
     generate_sine = generate_sine,
     generate_square = generate_square,
     set_display_mode = function(mode) display_mode = mode end,
+    set_streaming = function(on) STREAM_SAMPLES = on end,
     get_current_signal = function() return current_signal end,
     get_fft_result = function() return fft_result end,
-    get_fourier_coeffs = function() return fourier_coeffs end
-}
\ No newline at end of file
+    get_fourier_coeffs = function() return fourier_coeffs end,
+    get_frame_stats = function() return frame_clock end
+}
+
+-- This file is sent as a REPL chunk, so its return value is lost; register
+-- it so later commands can reach the state via package.loaded.fourier_main
+package.loaded["fourier_main"] = exports
+return exports
\ No newline at end of file
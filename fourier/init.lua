@@ -1,10 +1,11 @@
 -- ELM11 FFT System Initialization
 -- Common constants and utilities for FFT analysis
 
--- Configuration constants
-SAMPLE_RATE = 48000
-BUFFER_SIZE = 1024
-FFT_SIZE = 512
+-- Configuration constants (shared with the PC tools, see config.lua)
+local config = require("config")
+SAMPLE_RATE = config.SAMPLE_RATE
+BUFFER_SIZE = config.BUFFER_SIZE
+FFT_SIZE = config.FFT_SIZE
 
 -- Signal generation functions
 function generate_sine(freq, amp, sample_rate, buffer_size)
@@ -0,0 +1,141 @@
+-- ELM11 Result Marshalling
+-- Packs analysis state as binary arrays for the PC (read by result_marshal.py)
+-- Same format for files, pipes and the serial link
+
+local marshal = {}
+
+-- Message: "ELMR", version (u8), array count (u8), body length (u32)
+-- Array:   name length (u8), name, dtype (1 char), element count (u32), data
+-- dtype is "d" (float64) or "f" (float32); "D"/"F" are complex, stored as
+-- interleaved real/imaginary pairs
+marshal.MAGIC = "ELMR"
+marshal.VERSION = 1
+marshal.PACK_BATCH = 128  -- Values per string.pack call (bounds stack use)
+
+local REAL_TYPE = {d = "d", D = "d", f = "f", F = "f"}
+
+local function pack_values(values, fmt)
+    local parts = {}
+    for first = 1, #values, marshal.PACK_BATCH do
+        local last = math.min(first + marshal.PACK_BATCH - 1, #values)
+        parts[#parts+1] = string.pack("<" .. string.rep(fmt, last - first + 1),
+                                      table.unpack(values, first, last))
+    end
+    return table.concat(parts)
+end
+
+-- Flatten an FFT result into interleaved real/imag values
+-- Accepts {{real=, imag=}, ...} (init.lua) or flat {re, im, ...} (fourier_main.lua)
+local function interleave(fft_result)
+    if type(fft_result[1]) ~= "table" then
+        return fft_result
+    end
+    local flat = {}
+    for i, bin in ipairs(fft_result) do
+        flat[2*i-1] = bin.real
+        flat[2*i] = bin.imag
+    end
+    return flat
+end
+
+-- Pack a list of {name, values, dtype} arrays into one message
+function marshal.pack(arrays)
+    local body = {}
+    for _, array in ipairs(arrays) do
+        local name, values, dtype = array[1], array[2], array[3] or "d"
+        local count = #values
+        if dtype == "D" or dtype == "F" then
+            count = count // 2
+        end
+        body[#body+1] = string.pack("<s1c1I4", name, dtype, count)
+        body[#body+1] = pack_values(values, REAL_TYPE[dtype])
+    end
+    body = table.concat(body)
+    return string.pack("<c4BBI4", marshal.MAGIC, marshal.VERSION, #arrays, #body) .. body
+end
+
+-- Unpack a message into a table of name -> flat value list
+function marshal.unpack(data)
+    local magic, version, n_arrays, length, pos = string.unpack("<c4BBI4", data)
+    if magic ~= marshal.MAGIC or version ~= marshal.VERSION then
+        error("not an ELM11 result message")
+    end
+    local arrays = {}
+    for _ = 1, n_arrays do
+        local name, dtype, count
+        name, dtype, count, pos = string.unpack("<s1c1I4", data, pos)
+        local fmt = REAL_TYPE[dtype]
+        local n = (dtype == "D" or dtype == "F") and count * 2 or count
+        local values = {}
+        for i = 1, n do
+            values[i], pos = string.unpack("<" .. fmt, data, pos)
+        end
+        arrays[name] = values
+    end
+    return arrays
+end
+
+-- Pack analysis state: a table with current_signal, fft_result, fourier_coeffs
+-- and reconstructed (each optional). Without one, the globals of init.lua are
+-- used; fourier_main.lua keeps its state local, so pass marshal.main_state()
+function marshal.pack_state(dtype, state)
+    dtype = dtype or "d"
+    state = state or {current_signal = current_signal, fft_result = fft_result,
+                      fourier_coeffs = fourier_coeffs, reconstructed = reconstructed}
+    local complex = dtype == "d" and "D" or "F"
+    local arrays = {{"current_signal", state.current_signal or {}, dtype}}
+    local spectrum, coeffs = state.fft_result, state.fourier_coeffs
+    if spectrum and #spectrum > 0 then
+        arrays[#arrays+1] = {"fft_result", interleave(spectrum), complex}
+    end
+    if coeffs and coeffs.a_n then
+        arrays[#arrays+1] = {"a0", {coeffs.a0 or 0}, dtype}
+        arrays[#arrays+1] = {"a_n", coeffs.a_n, dtype}
+        arrays[#arrays+1] = {"b_n", coeffs.b_n, dtype}
+    end
+    if state.reconstructed then
+        arrays[#arrays+1] = {"reconstructed", state.reconstructed, dtype}
+    end
+    return marshal.pack(arrays)
+end
+
+-- State of the running fourier_main.lua, through its exported getters
+-- (nil if it has not been loaded)
+function marshal.main_state()
+    local main = package.loaded.fourier_main
+    if type(main) ~= "table" then return nil end
+    return {
+        current_signal = main.get_current_signal(),
+        fft_result = main.get_fft_result(),
+        fourier_coeffs = main.get_fourier_coeffs(),
+    }
+end
+
+-- Write the global state to a file
+function marshal.dump(path, dtype)
+    local f = assert(io.open(path, "wb"))
+    f:write(marshal.pack_state(dtype))
+    f:close()
+end
+
+-- Restore the global state written by marshal.dump, if the file exists
+function marshal.restore(path)
+    local f = io.open(path, "rb")
+    if not f then return false end
+    local arrays = marshal.unpack(f:read("a"))
+    f:close()
+
+    current_signal = arrays.current_signal or {}
+    if arrays.fft_result then
+        fft_result = {}
+        for i = 1, #arrays.fft_result // 2 do
+            fft_result[i] = {real = arrays.fft_result[2*i-1], imag = arrays.fft_result[2*i]}
+        end
+    end
+    if arrays.a_n then
+        fourier_coeffs = {a0 = arrays.a0[1], a_n = arrays.a_n, b_n = arrays.b_n}
+    end
+    return true
+end
+
+return marshal
@@ -0,0 +1,74 @@
+-- ELM11 Sample Stream Encoder
+-- Compresses 12-bit ADC codes before sending them over the serial link
+-- Block format matches sample_codec.py on the PC side (decoder)
+
+local codec = {}
+
+codec.SAMPLE_BITS = 12
+codec.BLOCK_SIZE = 256
+
+-- Block coding modes (see sample_codec.py)
+local MODE_RAW = 0
+local MODE_PACKED = 1
+
+-- Pack unsigned values LSB-first into a byte string
+local function pack_bits(values, first, last, width)
+    if width == 0 then return "" end
+    local out = {}
+    local acc, nbits = 0, 0
+    for i = first, last do
+        acc = acc | (values[i] << nbits)
+        nbits = nbits + width
+        while nbits >= 8 do
+            out[#out+1] = string.char(acc & 0xFF)
+            acc = acc >> 8
+            nbits = nbits - 8
+        end
+    end
+    if nbits > 0 then
+        out[#out+1] = string.char(acc & 0xFF)
+    end
+    return table.concat(out)
+end
+
+-- Encode samples[first..last] as one block
+-- Uses first-order delta coding with zigzag residuals, or raw 12-bit packing
+-- when the residuals would not be smaller
+function codec.encode_block(samples, first, last)
+    local n = last - first + 1
+    local residuals = {}
+    local max_zz = 0
+    for i = first + 1, last do
+        local d = samples[i] - samples[i-1]
+        local zz = d >= 0 and (d << 1) or ((-d << 1) - 1)
+        residuals[i] = zz
+        if zz > max_zz then max_zz = zz end
+    end
+
+    local width = 0
+    while (1 << width) <= max_zz do width = width + 1 end
+
+    local raw_len = (n * codec.SAMPLE_BITS + 7) // 8
+    local packed_len = 2 + ((n - 1) * width + 7) // 8
+    if n > 1 and packed_len < raw_len then
+        local payload = string.pack("<I2", samples[first]) ..
+            pack_bits(residuals, first + 1, last, width)
+        return string.pack("<BBI2I2", MODE_PACKED | (1 << 4), width, n, #payload) .. payload
+    end
+
+    local payload = pack_bits(samples, first, last, codec.SAMPLE_BITS)
+    return string.pack("<BBI2I2", MODE_RAW, codec.SAMPLE_BITS, n, #payload) .. payload
+end
+
+-- Encode a whole buffer of integer ADC codes (0..4095) as a block stream
+function codec.encode(samples, block_size)
+    block_size = block_size or codec.BLOCK_SIZE
+    local blocks = {}
+    for first = 1, #samples, block_size do
+        local last = math.min(first + block_size - 1, #samples)
+        blocks[#blocks+1] = codec.encode_block(samples, first, last)
+    end
+    return table.concat(blocks)
+end
+
+return codec
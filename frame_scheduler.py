@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# ELM11 Frame Scheduler
+# Fixed-rate acquire -> analyze -> render loop for real-time mode
+# Frame clock comes from hop size and sample rate; rendering is dropped first under overload
+
+import time
+
+import numpy as np
+
+# Jitter histogram bin edges, as a fraction of the frame period
+JITTER_BINS = np.array([0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, np.inf])
+RENDER_EMA = 0.2   # Smoothing of the render time estimate
+
+
+class SchedulerStats:
+    """Deadline, jitter and per-stage budget accounting for FrameScheduler"""
+
+    STAGES = ('acquire', 'analyze', 'render')
+
+    def __init__(self, frame_period):
+        self.frame_period = frame_period
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.deadline_misses = 0
+        self.renders = 0
+        self.renders_skipped = 0
+        self.max_lateness = 0.0
+        self.jitter_counts = np.zeros(len(JITTER_BINS) - 1, dtype=int)
+        self.stage_total = dict.fromkeys(self.STAGES, 0.0)
+        self.stage_max = dict.fromkeys(self.STAGES, 0.0)
+
+    def record_stage(self, stage, seconds):
+        self.stage_total[stage] += seconds
+        self.stage_max[stage] = max(self.stage_max[stage], seconds)
+
+    def record_jitter(self, seconds):
+        idx = np.searchsorted(JITTER_BINS, abs(seconds) / self.frame_period, side='right') - 1
+        self.jitter_counts[min(idx, len(self.jitter_counts) - 1)] += 1
+
+    def budget_usage(self):
+        """Mean and worst-case time per stage as a fraction of the frame period"""
+        usage = {}
+        for stage in self.STAGES:
+            count = self.renders if stage == 'render' else self.frames
+            mean = self.stage_total[stage] / count if count else 0.0
+            usage[stage] = (mean / self.frame_period, self.stage_max[stage] / self.frame_period)
+        return usage
+
+    def report(self):
+        """Human-readable summary"""
+        lines = [
+            f"Frame period: {self.frame_period * 1000:.2f} ms, {self.frames} frames",
+            f"Deadline misses: {self.deadline_misses} "
+            f"(worst {self.max_lateness * 1000:.2f} ms late)",
+            f"Renders: {self.renders} drawn, {self.renders_skipped} skipped",
+            "Budget usage (mean / max of frame period):",
+        ]
+        for stage, (mean, worst) in self.budget_usage().items():
+            lines.append(f"  {stage:<8} {mean:6.1%} / {worst:6.1%}")
+        lines.append("Start jitter (fraction of frame period):")
+        for lo, hi, count in zip(JITTER_BINS[:-1], JITTER_BINS[1:], self.jitter_counts):
+            label = f"{lo:g}-{hi:g}" if np.isfinite(hi) else f">{lo:g}"
+            lines.append(f"  {label:<10} {count}")
+        return "\n".join(lines)
+
+
+class FrameScheduler:
+    """Drive acquire/analyze/render callbacks on a fixed frame clock.
+
+    Frame k is acquired from start + k * frame_period, so timing errors do
+    not accumulate; acquire() may also block until its samples are ready.
+    Analysis and rendering then have one frame period from the end of
+    acquisition, while the next buffer fills. Render is skipped when the
+    estimated render time would push the frame past that deadline. A frame
+    more than one period late resynchronizes the clock instead of
+    bursting to catch up.
+    """
+
+    def __init__(self, hop_size, sample_rate, clock=time.perf_counter, sleep=time.sleep):
+        self.frame_period = hop_size / sample_rate
+        self.clock = clock
+        self.sleep = sleep
+        self.render_estimate = 0.0
+        self.stats = SchedulerStats(self.frame_period)
+
+    def _timed(self, stage, func):
+        start = self.clock()
+        result = func()
+        self.stats.record_stage(stage, self.clock() - start)
+        return result
+
+    def run(self, acquire, analyze, render=None, n_frames=None, should_stop=None):
+        """Run frames until n_frames have completed or should_stop() is true.
+
+        acquire() returns a frame of samples (or None to stop), analyze(frame)
+        processes it and render() draws the latest result.
+        """
+        next_start = self.clock()
+        frame = 0
+        while n_frames is None or frame < n_frames:
+            if should_stop is not None and should_stop():
+                break
+
+            # Wait for this frame's slot on the fixed clock
+            now = self.clock()
+            if now < next_start:
+                self.sleep(next_start - now)
+                now = self.clock()
+            self.stats.record_jitter(now - next_start)
+
+            samples = self._timed('acquire', acquire)
+            if samples is None:
+                break
+            # The next buffer is complete one period after this one
+            deadline = self.clock() + self.frame_period
+            self._timed('analyze', lambda: analyze(samples))
+
+            if render is not None:
+                if self.clock() + self.render_estimate <= deadline:
+                    start = self.clock()
+                    render()
+                    elapsed = self.clock() - start
+                    self.stats.record_stage('render', elapsed)
+                    self.stats.renders += 1
+                    self.render_estimate += RENDER_EMA * (elapsed - self.render_estimate)
+                else:
+                    self.stats.renders_skipped += 1
+                    # Let the estimate decay so rendering is retried once load drops
+                    self.render_estimate *= 1 - RENDER_EMA
+
+            finished = self.clock()
+            self.stats.frames += 1
+            frame += 1
+            if finished > deadline:
+                lateness = finished - deadline
+                self.stats.deadline_misses += 1
+                self.stats.max_lateness = max(self.stats.max_lateness, lateness)
+                if lateness > self.frame_period:
+                    next_start = finished  # Resynchronize rather than drift further behind
+                    continue
+            next_start += self.frame_period
+
+        return self.stats
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# ELM11 Multirate Front End
+# Decimation filter chains and zoom-FFT for narrowband analysis
+# Fine frequency resolution around a chosen center without a huge full-band FFT
+
+from functools import lru_cache
+
+import numpy as np
+
+# Filter design configuration
+TAPS_PER_PHASE = 24    # FIR length per polyphase branch
+KAISER_BETA = 7.0      # ~70 dB stopband attenuation
+MAX_STAGE_FACTOR = 8   # Larger factors are split into a chain of stages
+
+
+@lru_cache(maxsize=32)
+def design_lowpass(factor, taps_per_phase=TAPS_PER_PHASE, beta=KAISER_BETA):
+    """Kaiser-windowed sinc anti-aliasing filter for decimation by factor.
+
+    Designs are cached, so building many chains with the same factors
+    costs nothing after the first. The returned array is read-only.
+    """
+    num_taps = taps_per_phase * factor
+    cutoff = 1.0 / factor  # Output Nyquist, normalized to the input Nyquist
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = cutoff * np.sinc(cutoff * n) * np.kaiser(num_taps, beta)
+    taps /= taps.sum()
+    taps.setflags(write=False)
+    return taps
+
+
+def stage_factors(factor, max_stage=MAX_STAGE_FACTOR):
+    """Split a decimation factor into stages no larger than max_stage"""
+    stages = []
+    remaining = factor
+    while remaining > 1:
+        for f in range(min(max_stage, remaining), 1, -1):
+            if remaining % f == 0:
+                break
+        else:
+            raise ValueError(f"Decimation factor {factor} has a prime factor above {max_stage}")
+        stages.append(f)
+        remaining //= f
+    return stages
+
+
+def smooth_factor(limit, max_stage=MAX_STAGE_FACTOR):
+    """Largest factor <= limit that stage_factors can split into stages"""
+    for factor in range(max(1, int(limit)), 0, -1):
+        remaining = factor
+        for p in range(2, max_stage + 1):
+            while remaining % p == 0:
+                remaining //= p
+        if remaining == 1:
+            return factor
+    return 1
+
+
+class DecimatorStage:
+    """One streaming FIR decimator.
+
+    Only every factor-th output is computed (the polyphase form), and the
+    filter history is carried between calls so blocks can be any length.
+    """
+
+    def __init__(self, factor):
+        self.factor = factor
+        self.taps = design_lowpass(factor)[::-1]
+        self.reset()
+
+    def reset(self):
+        self.history = np.zeros(len(self.taps) - 1)
+        self.phase = 0  # Window index of the next output within history + input
+
+    def process(self, x):
+        x = np.asarray(x)
+        if len(x) == 0:
+            return x[:0]
+        buf = np.concatenate([self.history, x])
+        windows = np.lib.stride_tricks.sliding_window_view(buf, len(self.taps))
+        out = windows[self.phase::self.factor] @ self.taps
+
+        self.phase += len(out) * self.factor - len(x)
+        self.history = buf[len(buf) - (len(self.taps) - 1):]
+        return out
+
+
+class DecimationChain:
+    """Multistage decimator: sample_rate -> sample_rate / factor"""
+
+    def __init__(self, factor):
+        self.factor = factor
+        self.stages = [DecimatorStage(f) for f in stage_factors(factor)]
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, x):
+        for stage in self.stages:
+            x = stage.process(x)
+        return x
+
+
+class ZoomAnalyzer:
+    """Streaming zoom-FFT around a center frequency.
+
+    Input is mixed down so the center lands at 0 Hz, decimated to cover
+    span Hz, and analysed with averaged, 50%-overlapped FFTs of fft_size
+    points. Resolution is span / fft_size instead of sample_rate / fft_size.
+    """
+
+    def __init__(self, center, span, sample_rate, fft_size=512):
+        self.center = center
+        self.sample_rate = sample_rate
+        self.fft_size = fft_size
+        self.factor = smooth_factor(sample_rate / span)
+        self.span = sample_rate / self.factor
+        self.chain = DecimationChain(self.factor)
+        self.window = np.hanning(fft_size)
+        self.freqs = center + np.fft.fftshift(np.fft.fftfreq(fft_size, self.factor / sample_rate))
+        self.reset()
+
+    def reset(self):
+        self.chain.reset()
+        self.sample_index = 0  # Keeps the mixer phase continuous across blocks
+        self.pending = np.zeros(0, dtype=complex)
+        self.power_sum = np.zeros(self.fft_size)
+        self.last_spectrum = np.zeros(self.fft_size, dtype=complex)
+        self.segments = 0
+
+    def update(self, samples):
+        """Add a block of real samples; returns the number of new FFT segments"""
+        x = np.asarray(samples, dtype=np.float64)
+        n = self.sample_index + np.arange(len(x))
+        self.sample_index += len(x)
+        baseband = x * np.exp(-2j * np.pi * self.center / self.sample_rate * n)
+
+        data = np.concatenate([self.pending, self.chain.process(baseband)])
+        hop = self.fft_size // 2
+        if len(data) < self.fft_size:
+            self.pending = data
+            return 0
+
+        segments = np.lib.stride_tricks.sliding_window_view(data, self.fft_size)[::hop]
+        self.pending = data[len(segments) * hop:]
+        spectra = np.fft.fftshift(np.fft.fft(segments * self.window, axis=1), axes=1)
+        self.power_sum += np.sum(np.abs(spectra)**2, axis=0)
+        self.last_spectrum = spectra[-1]
+        self.segments += len(segments)
+        return len(segments)
+
+    def snapshot(self):
+        """Averaged zoom spectrum (magnitude) and the most recent complex spectrum"""
+        power = self.power_sum / self.segments if self.segments else self.power_sum
+        # Scale so a full-scale tone reads as its amplitude, like np.abs(fft) * 2 / N
+        gain = 2 / self.window.sum()
+        return {
+            'freqs': self.freqs.copy(),
+            'magnitude': np.sqrt(power) * gain,
+            'last_spectrum': self.last_spectrum * gain,
+            'resolution': self.span / self.fft_size,
+            'segments': self.segments,
+        }
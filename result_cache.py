@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# ELM11 Result Cache
+# Content-addressed cache for signals, spectra and analysis summaries
+# In-memory LRU in front of a compact on-disk store with size-based eviction
+
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+# Cache configuration
+CACHE_DIR = os.environ.get('ELM11_CACHE_DIR',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'elm11-fft'))
+MEMORY_ITEMS = 128                 # Results kept in memory
+DISK_LIMIT = 256 * 1024 * 1024     # Bytes kept on disk before evicting the least recently used
+FILE_CHUNK = 1 << 20               # Read size when hashing recordings
+
+
+def _feed(h, part):
+    """Add one key part to the hash with an unambiguous type tag"""
+    if isinstance(part, np.ndarray):
+        part = np.ascontiguousarray(part)
+        h.update(f"a{part.dtype.str}{part.shape}".encode())
+        h.update(part.data)
+    elif isinstance(part, (bytes, bytearray, memoryview)):
+        h.update(b"b%d:" % len(part))
+        h.update(part)
+    elif isinstance(part, dict):
+        h.update(b"m%d:" % len(part))
+        for name in sorted(part):
+            _feed(h, name)
+            _feed(h, part[name])
+    elif isinstance(part, (list, tuple)):
+        h.update(b"l%d:" % len(part))
+        for item in part:
+            _feed(h, item)
+    else:
+        # Numbers, strings, None and config objects with a stable repr
+        text = repr(part).encode()
+        h.update(b"r%d:" % len(text))
+        h.update(text)
+
+
+def cache_key(*parts):
+    """Hex digest identifying inputs, settings and code version"""
+    h = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        _feed(h, part)
+    return h.hexdigest()
+
+
+def file_digest(path):
+    """Digest of a file's contents, for keying results on recordings"""
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(FILE_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def code_version(*paths):
+    """Digest of the given source files; results are recomputed when they change"""
+    return cache_key(*(file_digest(path) for path in paths))
+
+
+class ResultCache:
+    """Two-tier cache of named NumPy arrays (like result_marshal messages).
+
+    Values are dicts of arrays. They are returned read-only so a caller
+    cannot alter a cached entry in place; copy them before modifying.
+    Disk entries are .npz files named by key; the file modification time
+    records last use, and the oldest files are removed once the store grows
+    past disk_limit bytes. Every put() writes a compressed file and rescans
+    the store, so the disk tier suits coarse results such as one summary
+    per recording. directory=None keeps the cache in memory only.
+    """
+
+    def __init__(self, directory=CACHE_DIR, memory_items=MEMORY_ITEMS, disk_limit=DISK_LIMIT):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.disk_limit = disk_limit
+        self.memory = OrderedDict()
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        """Cached arrays for key, or None"""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits['memory'] += 1
+            return self.memory[key]
+
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    value = {name: data[name] for name in data.files}
+                os.utime(path)  # Mark as recently used
+            except (OSError, ValueError):
+                value = None  # Missing, evicted meanwhile, or a truncated write
+            if value is not None:
+                for array in value.values():
+                    array.setflags(write=False)
+                self._remember(key, value)
+                self.hits['disk'] += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key, arrays):
+        """Store a dict of arrays (scalars are kept as 0-d arrays)"""
+        value = {}
+        for name, array in arrays.items():
+            array = np.array(array)
+            array.setflags(write=False)
+            value[name] = array
+        self._remember(key, value)
+
+        if self.directory is not None:
+            # Write to a temporary file first so readers never see a partial entry
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez_compressed(f, **value)
+                os.replace(tmp, self._path(key))
+            except OSError:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            self.evict()
+        return value
+
+    def get_or_compute(self, key, compute):
+        """Cached arrays for key, computing and storing them on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def evict(self, limit=None):
+        """Remove least recently used disk entries until the store fits in limit bytes"""
+        if self.directory is None:
+            return 0
+        limit = self.disk_limit if limit is None else limit
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.npz'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        self.memory.clear()
+        self.evict(limit=0)
+
+    def stats(self):
+        lookups = self.hits['memory'] + self.hits['disk'] + self.misses
+        return {
+            'memory_entries': len(self.memory),
+            'memory_hits': self.hits['memory'],
+            'disk_hits': self.hits['disk'],
+            'misses': self.misses,
+            'hit_rate': (lookups - self.misses) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# ELM11 Result Marshalling
+# Reads binary analysis results written by fourier/result_marshal.lua
+# straight into NumPy arrays, from files, pipes or the serial link
+
+import struct
+
+import numpy as np
+
+# Message header: magic, version, array count, body length
+MAGIC = b'ELMR'
+VERSION = 1
+HEADER = struct.Struct('<4sBBI')
+
+# Lua dtype codes -> NumPy dtypes (upper case is complex, interleaved re/im)
+DTYPES = {
+    b'd': np.dtype('<f8'),
+    b'f': np.dtype('<f4'),
+    b'D': np.dtype('<c16'),
+    b'F': np.dtype('<c8'),
+}
+
+
+def unpack_body(body, n_arrays):
+    """Map each array in a message body onto a NumPy array without copying"""
+    arrays = {}
+    offset = 0
+    for _ in range(n_arrays):
+        name_len = body[offset]
+        name = body[offset + 1:offset + 1 + name_len].decode()
+        offset += 1 + name_len
+        dtype = DTYPES[body[offset:offset + 1]]
+        count = struct.unpack_from('<I', body, offset + 1)[0]
+        offset += 5
+        arrays[name] = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+        offset += count * dtype.itemsize
+    return arrays
+
+
+def unpack_results(data):
+    """Decode one complete message (header + body) into a dict of arrays"""
+    magic, version, n_arrays, length = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not an ELM11 result message ({magic!r} v{version})")
+    return unpack_body(memoryview(data)[HEADER.size:HEADER.size + length].tobytes(), n_arrays)
+
+
+def read_results(path):
+    """Read a result file written by marshal.dump()"""
+    with open(path, 'rb') as f:
+        return unpack_results(f.read())
+
+
+def read_stream(read, max_skip=4096):
+    """Read one message from a byte stream such as a serial port.
+
+    read(n) returns up to n bytes. Text before the magic (REPL echo, prompts)
+    is skipped. Returns None if no complete message arrives.
+    """
+    window = b''
+    skipped = 0
+    while window != MAGIC:
+        byte = read(1)
+        if not byte or skipped > max_skip:
+            return None
+        window = (window + byte)[-len(MAGIC):]
+        skipped += 1
+
+    rest = _read_exact(read, HEADER.size - len(MAGIC))
+    if rest is None:
+        return None
+    _, version, n_arrays, length = HEADER.unpack(MAGIC + rest)
+    if version != VERSION:
+        raise ValueError(f"Unsupported result message version {version}")
+    body = _read_exact(read, length)
+    if body is None:
+        return None
+    return unpack_body(body, n_arrays)
+
+
+def _read_exact(read, n):
+    data = b''
+    while len(data) < n:
+        chunk = read(n - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def to_fourier_coeffs(arrays):
+    """Convert marshalled a0/a_n/b_n arrays to the FFTAnalyzer coefficient dict"""
+    if 'a_n' not in arrays:
+        return {}
+    return {
+        'a0': float(arrays['a0'][0]),
+        'a_n': list(arrays['a_n']),
+        'b_n': list(arrays['b_n']),
+    }
@@ -10,34 +10,164 @@ import sys
 import subprocess
 import os
 
-# FFT Configuration
-SAMPLE_RATE = 48000
-BUFFER_SIZE = 1024
-FFT_SIZE = 512
+from spectrum_publisher import SpectrumPublisher, parse_address, find_peaks
+from multirate import ZoomAnalyzer
+from frame_scheduler import FrameScheduler
+from fft_config import FFTConfig, next_fast_len
+from result_marshal import read_results, to_fourier_coeffs
+from result_cache import ResultCache, cache_key, code_version
+from harmonics import HarmonicAnalyzer, N_HARMONICS
+
+# FFT Configuration (defaults shared with the Lua side via fourier/config.lua)
+DEFAULT_CONFIG = FFTConfig()
+SAMPLE_RATE = DEFAULT_CONFIG.sample_rate
+BUFFER_SIZE = DEFAULT_CONFIG.buffer_size
+FFT_SIZE = DEFAULT_CONFIG.fft_size
+
+# Cached results are recomputed whenever the code producing them changes
+_HERE = os.path.dirname(os.path.abspath(__file__))
+CODE_VERSION = code_version(*(os.path.join(_HERE, name) for name in
+                              ('shim_interface.py', 'harmonics.py', 'fft_config.py')))
+
+class SpectrumAccumulator:
+    """Running Welch PSD, peak-hold and exponential moving average.
+
+    Samples can be fed in batches of any length; only the unconsumed tail of
+    the last segment is kept between updates, so memory stays O(fft_size)
+    however long the run.
+    """
+
+    def __init__(self, fft_size=FFT_SIZE, sample_rate=SAMPLE_RATE, overlap=0.5, ema_alpha=0.1):
+        self.fft_size = fft_size
+        self.sample_rate = sample_rate
+        self.hop = max(1, int(round(fft_size * (1 - overlap))))
+        if not 0 < ema_alpha <= 1:
+            raise ValueError(f"ema_alpha must be in (0, 1], got {ema_alpha}")
+        self.ema_alpha = ema_alpha
+
+        # Periodic Hann window and density scaling (same as scipy.signal.welch)
+        n = np.arange(fft_size)
+        self.window = 0.5 - 0.5 * np.cos(2 * np.pi * n / fft_size)
+        self.scale = np.full(fft_size // 2 + 1, 2.0 / (sample_rate * np.sum(self.window**2)))
+        self.scale[0] /= 2
+        if fft_size % 2 == 0:
+            self.scale[-1] /= 2
+        self.freqs = np.fft.rfftfreq(fft_size, 1/sample_rate)
+        self.reset()
+
+    def reset(self):
+        """Discard all accumulated history"""
+        n_bins = self.fft_size // 2 + 1
+        self.tail = np.zeros(0)
+        self.psd_sum = np.zeros(n_bins)
+        self.peak_hold = np.zeros(n_bins)
+        self.ema = np.zeros(n_bins)
+        self.segments = 0
+
+    def update(self, samples):
+        """Add a batch of samples; returns the number of new segments"""
+        data = np.concatenate([self.tail, np.asarray(samples, dtype=np.float64)])
+        if len(data) < self.fft_size:
+            self.tail = data
+            return 0
+
+        segments = np.lib.stride_tricks.sliding_window_view(data, self.fft_size)[::self.hop]
+        self.tail = data[len(segments) * self.hop:]
+
+        psd = np.abs(np.fft.rfft(segments * self.window, axis=1))**2 * self.scale
+        self.psd_sum += psd.sum(axis=0)
+        self.peak_hold = np.maximum(self.peak_hold, psd.max(axis=0))
+
+        # Apply the EMA recurrence to every new segment in one step
+        count = len(psd)
+        decay = 1 - self.ema_alpha
+        weights = decay ** np.arange(count - 1, -1, -1)
+        if self.segments == 0:
+            weights[0] /= self.ema_alpha  # First segment seeds the average
+        self.ema = decay**count * self.ema + self.ema_alpha * (weights @ psd)
+        self.segments += count
+        return count
+
+    def snapshot(self):
+        """Current averages; arrays are copies and safe to keep"""
+        psd = self.psd_sum / self.segments if self.segments else self.psd_sum.copy()
+        return {
+            'freqs': self.freqs.copy(),
+            'psd': psd,
+            'peak_hold': self.peak_hold.copy(),
+            'ema': self.ema.copy(),
+            'segments': self.segments,
+        }
+
+class MultiResolutionFFT:
+    """Short FFTs for transients and long FFTs for tonal detail on one stream.
+
+    Sizes no longer than an incoming block are run as 50%-overlapped
+    frames across the block (time resolution); longer sizes run once over
+    the most recent samples kept in a history of the largest size
+    (frequency resolution).
+    """
+
+    def __init__(self, sizes, sample_rate):
+        self.sizes = sorted(next_fast_len(size) for size in sizes)
+        self.sample_rate = sample_rate
+        self.windows = {size: np.hanning(size) for size in self.sizes}
+        self.freqs = {size: np.fft.rfftfreq(size, 1/sample_rate) for size in self.sizes}
+        self.history = np.zeros(self.sizes[-1])
+        self.spectra = {}
+
+    def update(self, samples):
+        """Analyse a new block; returns {size: (frames, bins) magnitude array}"""
+        x = np.asarray(samples, dtype=np.float64)
+        self.history = np.concatenate([self.history, x])[-len(self.history):]
+
+        for size in self.sizes:
+            if size <= len(x):
+                frames = np.lib.stride_tricks.sliding_window_view(x, size)[::max(1, size // 2)]
+            else:
+                frames = self.history[None, -size:]
+            window = self.windows[size]
+            self.spectra[size] = np.abs(np.fft.rfft(frames * window, axis=1)) * 2 / window.sum()
+        return self.spectra
 
 class FFTAnalyzer:
-    def __init__(self, use_lua=False):
+    def __init__(self, use_lua=False, publisher=None, config=None, multires=False, cache=None):
         self.use_lua = use_lua
+        self.publisher = publisher
+        # Off by default: for one buffer, recomputing is cheaper than hashing and
+        # lookup. Pass ResultCache(None) for a memory-only cache.
+        self.cache = cache
+        self.config = config or DEFAULT_CONFIG
         self.lua_file = 'fourier/fourier_main.lua'
-        self.current_signal = np.zeros(BUFFER_SIZE)
+        self.result_file = '/tmp/fft_results.bin'
+        self.lua_results = {}
+        self.current_signal = np.zeros(self.config.buffer_size)
         self.fft_result = None
         self.fourier_coeffs = {}
         self.display_mode = "time"
         self.live_mode = False
-
-        if not use_lua:
-            self.fig, self.axes = plt.subplots(2, 2, figsize=(12, 8))
-            self.fig.suptitle('ELM11 FFT Analyzer - PC Testing Interface')
-            plt.tight_layout()
+        self.accumulator = SpectrumAccumulator(self.config.fft_size, self.config.sample_rate)
+        self.zoom = None
+        self.multires = (MultiResolutionFFT(self.config.multires_sizes, self.config.sample_rate)
+                         if multires else None)
+        self.harmonics = HarmonicAnalyzer(self.config.buffer_size, self.config.sample_rate,
+                                          self.config.fft_size)
+
+        if use_lua and os.path.exists(self.result_file):
+            os.remove(self.result_file)  # Don't restore state from an earlier session
+
+        self.fig, self.axes = plt.subplots(2, 2, figsize=(12, 8))
+        self.fig.suptitle('ELM11 FFT Analyzer - PC Testing Interface')
+        plt.tight_layout()
 
         # Generate initial signal
         self.generate_sine(440, 1.0, 0)
-        if not use_lua:
-            self.compute_fft()
-            self.get_fourier_series(10)
-            self.update_plots()
+        self.compute_fft()
+        self.get_fourier_series(10)
+        self.update_plots()
 
-    def check_lua_available(self):
+    @staticmethod
+    def check_lua_available():
         """Check if Lua interpreter is available"""
         try:
             result = subprocess.run(['lua', '-v'], capture_output=True, text=True)
@@ -51,7 +181,7 @@ class FFTAnalyzer:
 
     def run_lua_code(self, code):
         """Execute Lua code and return result"""
-        if not self.check_lua_available():
+        if not FFTAnalyzer.check_lua_available():
             print("Lua interpreter not found. Using Python implementation.")
             self.use_lua = False
             return None
@@ -60,78 +190,128 @@ class FFTAnalyzer:
             # Create a temporary Lua script that loads both init and main files
             lua_script = f"""
 -- Load initialization
+package.path = "fourier/?.lua;" .. package.path
 dofile("fourier/init.lua")
 
--- Load main FFT code
-dofile("{self.lua_file}")
+-- Use this analyzer's settings rather than the fourier/config.lua defaults
+SAMPLE_RATE = {self.config.sample_rate}
+BUFFER_SIZE = {self.config.buffer_size}
+FFT_SIZE = {self.config.fft_size}
+
+-- Load main FFT code (its LÖVE2D modules only exist on the ELM11)
+pcall(dofile, "{self.lua_file}")
+
+-- Restore state left by the previous call
+local marshal = dofile("fourier/result_marshal.lua")
+marshal.restore("{self.result_file}")
 
 -- Execute the requested code
 {code}
+
+-- Hand results back to Python
+marshal.dump("{self.result_file}")
 """
             with open('/tmp/fft_temp.lua', 'w') as f:
                 f.write(lua_script)
 
             result = subprocess.run(['lua', '/tmp/fft_temp.lua'],
                                   capture_output=True, text=True, timeout=10)
+            if result.returncode == 0:
+                self.load_lua_results()
             return result.stdout + result.stderr
         except Exception as e:
             print(f"Error running Lua code: {e}")
             return None
 
+    def load_lua_results(self):
+        """Map the arrays marshalled by the last Lua run into NumPy"""
+        try:
+            self.lua_results = read_results(self.result_file)
+        except (OSError, ValueError) as e:
+            print(f"Error reading Lua results: {e}")
+            return
+
+        self.current_signal = self.lua_results['current_signal']
+        if 'fft_result' in self.lua_results:
+            self.fft_result = self.lua_results['fft_result']
+        self.fourier_coeffs = to_fourier_coeffs(self.lua_results)
+
+    def cached(self, compute, *parts):
+        """Arrays from compute(), reused when parts, settings and code are unchanged.
+
+        Cached arrays are copied, so callers may modify the results in place.
+        """
+        if self.cache is None:
+            return compute()
+        arrays = self.cache.get_or_compute(cache_key(*parts, self.config, CODE_VERSION), compute)
+        return {name: np.array(value) for name, value in arrays.items()}
+
+    def time_axis(self):
+        """Sample times of one buffer"""
+        return np.arange(self.config.buffer_size) / self.config.sample_rate
+
     def generate_sine(self, freq=440, amp=1.0, phase=0):
         """Generate sine wave"""
         if self.use_lua:
             lua_code = f"""
-current_signal = generate_sine({freq}, {amp}, {SAMPLE_RATE}, {BUFFER_SIZE})
+current_signal = generate_sine({freq}, {amp}, SAMPLE_RATE, BUFFER_SIZE)
 print("Generated sine wave at " .. {freq} .. " Hz")
 """
             result = self.run_lua_code(lua_code)
             print(result or "Signal generated")
         else:
-            t = np.linspace(0, BUFFER_SIZE/SAMPLE_RATE, BUFFER_SIZE, endpoint=False)
-            self.current_signal = amp * np.sin(2 * np.pi * freq * t + phase)
+            def generate():
+                t = self.time_axis()
+                return {'signal': amp * np.sin(2 * np.pi * freq * t + phase)}
+            self.current_signal = self.cached(generate, 'sine', freq, amp, phase)['signal']
             return self.current_signal
 
     def generate_square(self, freq=440, amp=1.0):
         """Generate square wave"""
         if self.use_lua:
             lua_code = f"""
-current_signal = generate_square({freq}, {amp}, {SAMPLE_RATE}, {BUFFER_SIZE})
+current_signal = generate_square({freq}, {amp}, SAMPLE_RATE, BUFFER_SIZE)
 print("Generated square wave at " .. {freq} .. " Hz")
 """
             result = self.run_lua_code(lua_code)
             print(result or "Signal generated")
         else:
-            t = np.linspace(0, BUFFER_SIZE/SAMPLE_RATE, BUFFER_SIZE, endpoint=False)
-            self.current_signal = amp * np.sign(np.sin(2 * np.pi * freq * t))
+            def generate():
+                t = self.time_axis()
+                return {'signal': amp * np.sign(np.sin(2 * np.pi * freq * t))}
+            self.current_signal = self.cached(generate, 'square', freq, amp)['signal']
             return self.current_signal
 
     def generate_sawtooth(self, freq=440, amp=1.0):
         """Generate sawtooth wave"""
         if self.use_lua:
             lua_code = f"""
-current_signal = generate_sawtooth({freq}, {amp}, {SAMPLE_RATE}, {BUFFER_SIZE})
+current_signal = generate_sawtooth({freq}, {amp}, SAMPLE_RATE, BUFFER_SIZE)
 print("Generated sawtooth wave at " .. {freq} .. " Hz")
 """
             result = self.run_lua_code(lua_code)
             print(result or "Signal generated")
         else:
-            t = np.linspace(0, BUFFER_SIZE/SAMPLE_RATE, BUFFER_SIZE, endpoint=False)
-            self.current_signal = amp * (2 * (freq * t - np.floor(freq * t + 0.5)))
+            def generate():
+                t = self.time_axis()
+                return {'signal': amp * (2 * (freq * t - np.floor(freq * t + 0.5)))}
+            self.current_signal = self.cached(generate, 'sawtooth', freq, amp)['signal']
             return self.current_signal
 
     def generate_triangle(self, freq=440, amp=1.0):
         """Generate triangle wave"""
         if self.use_lua:
             lua_code = f"""
-current_signal = generate_triangle({freq}, {amp}, {SAMPLE_RATE}, {BUFFER_SIZE})
+current_signal = generate_triangle({freq}, {amp}, SAMPLE_RATE, BUFFER_SIZE)
 print("Generated triangle wave at " .. {freq} .. " Hz")
 """
             result = self.run_lua_code(lua_code)
             print(result or "Signal generated")
         else:
-            t = np.linspace(0, BUFFER_SIZE/SAMPLE_RATE, BUFFER_SIZE, endpoint=False)
-            self.current_signal = amp * (2 * np.abs(2 * (freq * t - np.floor(freq * t + 0.5))) - 1)
+            def generate():
+                t = self.time_axis()
+                return {'signal': amp * (2 * np.abs(2 * (freq * t - np.floor(freq * t + 0.5))) - 1)}
+            self.current_signal = self.cached(generate, 'triangle', freq, amp)['signal']
             return self.current_signal
 
     def compute_fft(self):
@@ -144,7 +324,9 @@ print("FFT computed")
             result = self.run_lua_code(lua_code)
             print(result or "FFT computed")
         else:
-            self.fft_result = np.fft.fft(self.current_signal, n=FFT_SIZE)
+            def transform():
+                return {'fft': np.fft.fft(self.current_signal, n=self.config.fft_size)}
+            self.fft_result = self.cached(transform, 'fft', self.current_signal)['fft']
             return self.fft_result
 
     def get_fourier_series(self, n_harmonics=10):
@@ -160,68 +342,131 @@ print("Fourier series coefficients calculated")
             if self.fft_result is None:
                 self.compute_fft()
 
-            coeffs = {'a0': 0, 'a_n': [], 'b_n': []}
+            arrays = self.cached(lambda: self.fourier_series_arrays(n_harmonics),
+                                 'fourier', self.fft_result, n_harmonics)
+            self.fourier_coeffs = to_fourier_coeffs(arrays)
+            return self.fourier_coeffs
+
+    def fourier_series_arrays(self, n_harmonics):
+        """Fourier series coefficients of the current FFT as a0/a_n/b_n arrays"""
+        coeffs = {'a0': [0], 'a_n': [], 'b_n': []}
+
+        # Normalize by the real sample count; zero-padding adds no energy
+        n_samples = self.config.buffer_size
 
-            # DC component
-            coeffs['a0'] = np.real(self.fft_result[0]) / FFT_SIZE * 2
+        # DC component
+        coeffs['a0'] = [np.real(self.fft_result[0]) / n_samples * 2]
 
-            # Fundamental frequency
-            fundamental_idx = 1
+        # Fundamental frequency
+        fundamental_idx = 1
 
-            for n in range(1, n_harmonics + 1):
-                idx = n * fundamental_idx
-                if idx < len(self.fft_result) // 2:
-                    real_part = np.real(self.fft_result[idx])
-                    imag_part = np.imag(self.fft_result[idx])
+        for n in range(1, n_harmonics + 1):
+            idx = n * fundamental_idx
+            if idx < len(self.fft_result) // 2:
+                real_part = np.real(self.fft_result[idx])
+                imag_part = np.imag(self.fft_result[idx])
 
-                    # Convert to trigonometric form
-                    magnitude = np.sqrt(real_part**2 + imag_part**2)
-                    phase = np.arctan2(imag_part, real_part)
+                # Convert to trigonometric form
+                magnitude = np.sqrt(real_part**2 + imag_part**2)
+                phase = np.arctan2(imag_part, real_part)
 
-                    # a_n = 2 * magnitude * cos(phase) / N
-                    # b_n = 2 * magnitude * sin(phase) / N
-                    coeffs['a_n'].append(2 * magnitude * np.cos(phase) / FFT_SIZE)
-                    coeffs['b_n'].append(2 * magnitude * np.sin(phase) / FFT_SIZE)
+                # a_n = 2 * magnitude * cos(phase) / N
+                # b_n = 2 * magnitude * sin(phase) / N
+                coeffs['a_n'].append(2 * magnitude * np.cos(phase) / n_samples)
+                coeffs['b_n'].append(2 * magnitude * np.sin(phase) / n_samples)
 
-            self.fourier_coeffs = coeffs
-            return coeffs
+        return coeffs
 
     def reconstruct_signal(self, n_harmonics=10):
         """Reconstruct signal from Fourier coefficients"""
         if self.use_lua:
+            # init.lua's reconstruct_signal indexes a_n[1..n]; don't ask for more than exist
+            if self.fourier_coeffs:
+                n_harmonics = min(n_harmonics, len(self.fourier_coeffs['a_n']))
             lua_code = f"""
 reconstructed = reconstruct_signal({n_harmonics})
 print("Signal reconstructed with " .. {n_harmonics} .. " harmonics")
 """
             result = self.run_lua_code(lua_code)
             print(result or "Signal reconstructed")
-            return None  # Would need to parse result
+            return self.lua_results.get('reconstructed')
         else:
             if not self.fourier_coeffs:
                 self.get_fourier_series(n_harmonics)
+            return self.reconstruct_from_coeffs()
 
-            t = np.linspace(0, BUFFER_SIZE/SAMPLE_RATE, BUFFER_SIZE, endpoint=False)
-            reconstructed = np.full_like(t, self.fourier_coeffs['a0'] / 2)
+    def reconstruct_from_coeffs(self):
+        """Sum the current Fourier coefficients in NumPy (works on marshalled Lua results too)"""
+        t = self.time_axis()
+        reconstructed = np.full_like(t, self.fourier_coeffs['a0'] / 2)
 
-            for n in range(len(self.fourier_coeffs['a_n'])):
-                freq = (n+1) * 440  # Assuming 440Hz fundamental
-                reconstructed += (self.fourier_coeffs['a_n'][n] * np.cos(2 * np.pi * freq * t) +
-                                self.fourier_coeffs['b_n'][n] * np.sin(2 * np.pi * freq * t))
+        for n in range(len(self.fourier_coeffs['a_n'])):
+            freq = (n+1) * 440  # Assuming 440Hz fundamental
+            reconstructed += (self.fourier_coeffs['a_n'][n] * np.cos(2 * np.pi * freq * t) +
+                            self.fourier_coeffs['b_n'][n] * np.sin(2 * np.pi * freq * t))
 
-            return reconstructed
+        return reconstructed
+
+    def set_zoom(self, center=None, span=100, fft_size=None):
+        """Enable zoom-FFT around center Hz covering span Hz (None disables it)"""
+        fft_size = fft_size or self.config.fft_size
+        self.zoom = None if center is None else ZoomAnalyzer(center, span, self.config.sample_rate, fft_size)
+        return self.zoom
+
+    def compute_zoom_fft(self):
+        """Feed the current signal to the zoom-FFT and return its snapshot"""
+        if self.zoom is None:
+            return None
+        self.zoom.update(self.current_signal)
+        return self.zoom.snapshot()
+
+    def configure(self, config, multires=False):
+        """Switch buffer/FFT sizes; resets averaging state and regenerates the signal"""
+        self.config = config
+        self.accumulator = SpectrumAccumulator(config.fft_size, config.sample_rate)
+        self.multires = MultiResolutionFFT(config.multires_sizes, config.sample_rate) if multires else None
+        self.harmonics = HarmonicAnalyzer(config.buffer_size, config.sample_rate, config.fft_size)
+        self.zoom = None
+        self.fft_result = None
+        self.fourier_coeffs = {}
+        self.generate_sine(440, 1.0, 0)
+        self.compute_fft()
+        self.get_fourier_series(10)
+
+    def analyze_harmonics(self, n_harmonics=N_HARMONICS):
+        """Fundamental, harmonic levels, THD, THD+N and SINAD of the current signal"""
+        return self.cached(lambda: self.harmonics.analyze(self.current_signal, n_harmonics),
+                           'harmonics', self.current_signal, n_harmonics)
+
+    def compute_multires(self):
+        """Run the multi-resolution FFTs on the current signal, if enabled"""
+        if self.multires is None:
+            return None
+        return self.multires.update(self.current_signal)
+
+    def publish_frame(self, thd=None):
+        """Send the current spectrum, coefficients and THD (%) to subscribers.
+
+        Pass thd when it is already known for this frame to avoid measuring it twice.
+        """
+        if self.publisher is None or self.fft_result is None:
+            return 0
+        if thd is None:
+            thd = calculate_thd(self)
+
+        fft_size = self.config.fft_size
+        magnitudes = np.abs(self.fft_result)[:fft_size//2 + 1]
+        return self.publisher.publish(magnitudes, self.config.sample_rate, fft_size,
+                                      self.fourier_coeffs, thd)
 
     def update_plots(self):
         """Update all visualization plots"""
-        if self.use_lua:
-            print("Plotting not available in Lua mode - use Python implementation for visualization")
-            return
-
         self.axes[0, 0].clear()
         self.axes[0, 1].clear()
         self.axes[1, 0].clear()
         self.axes[1, 1].clear()
 
-        t = np.linspace(0, BUFFER_SIZE/SAMPLE_RATE, BUFFER_SIZE)
+        t = self.time_axis()
 
         # Time domain
         self.axes[0, 0].plot(t, self.current_signal, 'g-', linewidth=1)
@@ -232,20 +477,21 @@ print("Signal reconstructed with " .. {n_harmonics} .. " harmonics")
 
         # Frequency domain
         if self.fft_result is not None:
-            freqs = np.fft.fftfreq(FFT_SIZE, 1/SAMPLE_RATE)
-            magnitudes = np.abs(self.fft_result)[:FFT_SIZE//2]
-            freqs = freqs[:FFT_SIZE//2]
+            fft_size = self.config.fft_size
+            freqs = np.fft.fftfreq(fft_size, 1/self.config.sample_rate)
+            magnitudes = np.abs(self.fft_result)[:fft_size//2]
+            freqs = freqs[:fft_size//2]
 
             self.axes[0, 1].plot(freqs, 20 * np.log10(magnitudes + 1e-10), 'b-', linewidth=1)
             self.axes[0, 1].set_title('Frequency Domain (dB)')
             self.axes[0, 1].set_xlabel('Frequency (Hz)')
             self.axes[0, 1].set_ylabel('Magnitude (dB)')
-            self.axes[0, 1].set_xlim(0, SAMPLE_RATE/2)
+            self.axes[0, 1].set_xlim(0, self.config.sample_rate/2)
             self.axes[0, 1].grid(True, alpha=0.3)
 
-        # Fourier series reconstruction
-        if self.fourier_coeffs:
-            reconstructed = self.reconstruct_signal()
+        # Fourier series reconstruction (no Lua round trip per refresh)
+        reconstructed = self.reconstruct_from_coeffs() if self.fourier_coeffs else None
+        if reconstructed is not None:
             self.axes[1, 0].plot(t, self.current_signal, 'g-', alpha=0.7, label='Original')
             self.axes[1, 0].plot(t, reconstructed, 'r-', linewidth=2, label='Reconstructed')
             self.axes[1, 0].set_title('Fourier Series Reconstruction')
@@ -307,8 +553,8 @@ def run_signal_generation_demo(analyzer):
 
         analyzer.compute_fft()
         analyzer.get_fourier_series(10)
-        if not analyzer.use_lua:
-            analyzer.update_plots()
+        analyzer.publish_frame()
+        analyzer.update_plots()
 
         print(f"Generated {choice}")
         if analyzer.use_lua:
@@ -326,33 +572,32 @@ def run_fft_analysis_demo(analyzer):
     analyzer.generate_sine(440, 1.0, 0)
     analyzer.compute_fft()
     analyzer.get_fourier_series(10)
-    if not analyzer.use_lua:
-        analyzer.update_plots()
+    analyzer.update_plots()
 
     print("FFT Analysis Results:")
     print("-" * 40)
 
     if analyzer.use_lua:
         print("FFT analysis performed using Lua code")
-        print("Results available in Lua environment")
-    elif analyzer.fft_result is not None:
-        # Find peak frequency
-        magnitudes = np.abs(analyzer.fft_result)[:FFT_SIZE//2]
-        freqs = np.fft.fftfreq(FFT_SIZE, 1/SAMPLE_RATE)[:FFT_SIZE//2]
-        peak_idx = np.argmax(magnitudes)
-        peak_freq = freqs[peak_idx]
-        peak_mag = magnitudes[peak_idx]
-
-        print(f"Peak frequency: {peak_freq:.1f} Hz")
-        print(f"Peak magnitude: {peak_mag:.2f}")
-        print(f"Expected: 440 Hz (bin {int(440 * FFT_SIZE / SAMPLE_RATE)})")
+    if analyzer.fft_result is not None:
+        # Fundamental, interpolated between bins, and distortion figures
+        config = analyzer.config
+        magnitudes = np.abs(analyzer.fft_result)[:config.fft_size//2]
+        result = analyzer.analyze_harmonics()
+
+        print(f"Fundamental: {result['fundamental'][0]:.2f} Hz "
+              f"(interpolated, bins are {config.bin_hz:.1f} Hz)")
+        print(f"Amplitude: {result['amplitude'][0]:.3f}")
+        print(f"THD: {result['thd'][0] * 100:.3f}%  THD+N: {result['thd_n'][0] * 100:.3f}%  "
+              f"SINAD: {result['sinad'][0]:.1f} dB")
+        print(f"Expected: 440 Hz (bin {440 / config.bin_hz:.2f})")
 
         # Show some frequency bins
         print("\nFirst 10 frequency bins:")
         for i in range(min(10, len(magnitudes))):
             print(".1f")
 
-    if not analyzer.use_lua and analyzer.fourier_coeffs:
+    if analyzer.fourier_coeffs:
         print("\nFourier Series Coefficients:")
         print(".3f")
         for i, (a, b) in enumerate(zip(analyzer.fourier_coeffs['a_n'][:5],
@@ -393,22 +638,9 @@ def run_fourier_series_demo(analyzer):
                 break
 
 def calculate_thd(analyzer):
-    """Calculate Total Harmonic Distortion"""
-    if not analyzer.fourier_coeffs or not analyzer.fourier_coeffs['a_n']:
-        return 0
-
-    fundamental = np.sqrt(analyzer.fourier_coeffs['a_n'][0]**2 +
-                         analyzer.fourier_coeffs['b_n'][0]**2)
-
-    harmonics_sum = 0
-    for i in range(1, len(analyzer.fourier_coeffs['a_n'])):
-        harmonics_sum += analyzer.fourier_coeffs['a_n'][i]**2 + analyzer.fourier_coeffs['b_n'][i]**2
-
-    if fundamental == 0:
-        return 0
-
-    thd = np.sqrt(harmonics_sum) / fundamental * 100
-    return thd
+    """Total Harmonic Distortion (%) over as many harmonics as the current Fourier series"""
+    n_harmonics = len(analyzer.fourier_coeffs.get('a_n', [])) or N_HARMONICS
+    return float(analyzer.analyze_harmonics(n_harmonics)['thd'][0]) * 100
 
 def run_realtime_simulation(analyzer):
     """Simulate real-time FFT analysis"""
@@ -417,34 +649,150 @@ def run_realtime_simulation(analyzer):
     print("Simulating live audio input with changing frequencies")
 
     analyzer.live_mode = True
+    analyzer.accumulator.reset()
 
     # Simulate changing frequency over time
-    freq = 220
-    direction = 1
+    sweep = {'freq': 220, 'direction': 1}
+    thd_history = []
+
+    def acquire():
+        # Generate signal with slowly changing frequency
+        analyzer.generate_sine(sweep['freq'], 1.0, 0)
+        sweep['freq'] += sweep['direction'] * 10
+        if sweep['freq'] > 880 or sweep['freq'] < 220:
+            sweep['direction'] *= -1
+        return analyzer.current_signal
+
+    def analyze(samples):
+        analyzer.compute_fft()
+        analyzer.get_fourier_series(5)
+        thd = analyzer.analyze_harmonics(5)['thd'][0]
+        thd_history.append(thd)
+        analyzer.publish_frame(thd * 100)
+        analyzer.accumulator.update(samples)
+        analyzer.compute_zoom_fft()
+        analyzer.compute_multires()
+
+    def render():
+        analyzer.update_plots()
+        plt.pause(0.001)
 
+    # One frame per buffer: the frame clock matches the simulated sample rate
+    scheduler = FrameScheduler(analyzer.config.buffer_size, analyzer.config.sample_rate)
     try:
-        for frame in range(100):  # Simulate 100 frames
-            # Generate signal with slowly changing frequency
-            analyzer.generate_sine(freq, 1.0, 0)
-            analyzer.compute_fft()
-            analyzer.get_fourier_series(5)
-
-            # Update frequency
-            freq += direction * 10
-            if freq > 880 or freq < 220:
-                direction *= -1
+        scheduler.run(acquire, analyze, render, n_frames=100)  # Simulate 100 frames
+    except KeyboardInterrupt:
+        print("\nSimulation stopped")
 
-            if not analyzer.use_lua:
-                analyzer.update_plots()
-                plt.pause(0.1)  # 10 FPS simulation
+    print(scheduler.stats.report())
+    if thd_history:
+        print(f"THD per frame: mean {np.mean(thd_history) * 100:.3f}%, "
+              f"max {np.max(thd_history) * 100:.3f}%")
 
-            print(".1f")
+    if analyzer.multires is not None:
+        for size, spectra in analyzer.multires.spectra.items():
+            peak = np.argmax(spectra[-1])
+            print(f"FFT {size}: {len(spectra)} frame(s) per block, "
+                  f"{analyzer.config.sample_rate / size:.1f} Hz bins, "
+                  f"last peak {analyzer.multires.freqs[size][peak]:.1f} Hz")
 
-    except KeyboardInterrupt:
-        print("\nSimulation stopped")
+    summary = analyzer.accumulator.snapshot()
+    if summary['segments']:
+        peak = np.argmax(summary['peak_hold'])
+        print(f"Averaged {summary['segments']} segments; "
+              f"peak-hold maximum at {summary['freqs'][peak]:.1f} Hz")
 
     analyzer.live_mode = False
 
+def run_zoom_fft_demo(analyzer):
+    """Demonstrate zoom-FFT resolution on two closely spaced tones"""
+    print("Zoom FFT Demo")
+    print("=" * 40)
+
+    center = float(questionary.text("Center frequency (Hz):", default="440").ask())
+    span = float(questionary.text("Span (Hz):", default="100").ask())
+    config = analyzer.config
+    zoom = analyzer.set_zoom(center, span, config.fft_size)
+
+    # Two tones 5 Hz apart, streamed in buffer-sized frames for enough
+    # decimated samples to average a few zoom segments
+    tones = [(center, 1.0), (center + 5, 0.5)]
+    n_samples = zoom.factor * config.fft_size * 3
+    print("Test signal: " + ", ".join(f"{f:.1f} Hz (amp {a})" for f, a in tones))
+    print(f"Streaming {n_samples / config.sample_rate:.1f} s of input")
+    for start in range(0, n_samples, config.buffer_size):
+        t = (start + np.arange(config.buffer_size)) / config.sample_rate
+        analyzer.current_signal = sum(a * np.sin(2 * np.pi * f * t) for f, a in tones)
+        analyzer.compute_zoom_fft()
+
+    snapshot = zoom.snapshot()
+    print(f"Full-band resolution: {config.bin_hz:.2f} Hz per bin")
+    print(f"Zoom resolution: {snapshot['resolution']:.2f} Hz per bin "
+          f"(decimation x{zoom.factor}, {snapshot['segments']} segments averaged)")
+
+    freqs = snapshot['freqs']
+    for freq, mag in find_peaks(snapshot['magnitude'], freqs[1] - freqs[0], 3):
+        print(f"  Peak at {freqs[0] + freq:.2f} Hz, amplitude {mag:.2f}")
+
+    analyzer.set_zoom(None)
+    input("\nPress Enter to continue...")
+
+def run_settings_menu(analyzer):
+    """Change buffer and FFT sizes without editing code"""
+    config = analyzer.config
+    print(f"Current settings: {config}")
+    buffer_size = int(questionary.text("Buffer size (samples):",
+                                       default=str(config.buffer_size)).ask())
+    fft_text = questionary.text("FFT size (0 = next fast length >= buffer):",
+                                default=str(config.fft_size)).ask()
+    sizes_text = questionary.text("Multi-resolution FFT sizes (comma separated):",
+                                  default=",".join(str(n) for n in config.multires_sizes)).ask()
+    multires = questionary.confirm("Enable multi-resolution mode?",
+                                   default=analyzer.multires is not None).ask()
+
+    new_config = FFTConfig(config.sample_rate, buffer_size, int(fft_text),
+                           [int(n) for n in sizes_text.split(",") if n.strip()])
+    if new_config.fft_size != max(int(fft_text), buffer_size):
+        print(f"FFT size rounded up to fast length {new_config.fft_size}")
+    analyzer.configure(new_config, multires)
+    analyzer.update_plots()
+    print(f"Frame latency {new_config.buffer_size / new_config.sample_rate * 1000:.1f} ms, "
+          f"resolution {new_config.bin_hz:.2f} Hz per bin")
+
+    if analyzer.cache is not None:
+        stats = analyzer.cache.stats()
+        print(f"Result cache: {stats['memory_hits']} memory hits, "
+              f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+    enable = questionary.confirm("Cache results in memory (helps only for long buffers)?",
+                                 default=analyzer.cache is not None).ask()
+    if not enable:
+        analyzer.cache = None
+    elif analyzer.cache is None:
+        analyzer.cache = ResultCache(None)
+
+def run_publisher_setup(analyzer):
+    """Start or stop streaming frames to remote dashboards"""
+    if analyzer.publisher is not None:
+        for i, stats in enumerate(analyzer.publisher.stats()):
+            print(f"Subscriber {i}: sent {stats['sent']}, dropped {stats['dropped']}")
+        if questionary.confirm("Stop spectrum publisher?").ask():
+            analyzer.publisher.stop()
+            analyzer.publisher = None
+            print("Spectrum publisher stopped")
+        return
+
+    address = questionary.text("Publish address (host:port or Unix socket path):",
+                               default="127.0.0.1:5555").ask()
+    decimation = int(questionary.text("Spectrum decimation factor:", default="1").ask())
+    try:
+        analyzer.publisher = SpectrumPublisher(parse_address(address),
+                                               spectrum_decimation=decimation).start()
+    except OSError as e:
+        print(f"Could not start publisher: {e}")
+        return
+    print(f"Publishing frames on {address}")
+    print(f"Connect a dashboard with: python3 spectrum_publisher.py {address}")
+
 def main():
     print("ELM11 FFT Testing Interface")
     print("=" * 40)
@@ -453,7 +801,7 @@ def main():
     print("")
 
     # Check if Lua is available and ask user preference
-    lua_available = FFTAnalyzer().check_lua_available()
+    lua_available = FFTAnalyzer.check_lua_available()
     use_lua = False
 
     if lua_available:
@@ -461,7 +809,7 @@ def main():
             "Choose implementation:",
             choices=[
                 "Python (NumPy/Matplotlib) - Full visualization",
-                "Lua (Same code as ELM11) - Text output only"
+                "Lua (Same code as ELM11) - Results marshalled back for plotting"
             ]
         ).ask()
 
@@ -471,13 +819,6 @@ def main():
 
     analyzer = FFTAnalyzer(use_lua=use_lua)
 
-    if not use_lua:
-        # Generate initial signal and plots for Python mode
-        analyzer.generate_sine(440, 1.0, 0)
-        analyzer.compute_fft()
-        analyzer.get_fourier_series(10)
-        analyzer.update_plots()
-
     while True:
         choice = questionary.select(
             "Choose a demo:",
@@ -486,7 +827,10 @@ def main():
                 "FFT Analysis",
                 "Fourier Series Reconstruction",
                 "Real-time Simulation",
+                "Zoom FFT",
                 "Show Current Plots",
+                "Analyzer Settings",
+                "Spectrum Publisher",
                 "Exit"
             ]
         ).ask()
@@ -499,16 +843,21 @@ def main():
             run_fourier_series_demo(analyzer)
         elif choice == "Real-time Simulation":
             run_realtime_simulation(analyzer)
+        elif choice == "Zoom FFT":
+            run_zoom_fft_demo(analyzer)
         elif choice == "Show Current Plots":
-            if use_lua:
-                print("Plotting not available in Lua mode - use Python implementation for visualization")
-            else:
-                analyzer.update_plots()
-                plt.show(block=False)
-                input("Press Enter to continue...")
+            analyzer.update_plots()
+            plt.show(block=False)
+            input("Press Enter to continue...")
+        elif choice == "Analyzer Settings":
+            run_settings_menu(analyzer)
+        elif choice == "Spectrum Publisher":
+            run_publisher_setup(analyzer)
         elif choice == "Exit":
             break
 
+    if analyzer.publisher is not None:
+        analyzer.publisher.stop()
     plt.close('all')
     print("Goodbye!")
 
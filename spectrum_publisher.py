@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# ELM11 Spectrum Publisher
+# Streams computed FFT frames to remote dashboards over a local socket
+# One capture/analysis process feeds any number of subscribers
+
+import socket
+import struct
+import threading
+import time
+import os
+import stat
+import sys
+from collections import deque
+
+import numpy as np
+
+# Publisher configuration
+DEFAULT_ADDRESS = ('127.0.0.1', 5555)
+QUEUE_SIZE = 8        # Frames buffered per subscriber before dropping oldest
+MAX_PEAKS = 5
+
+# Frame layout (little-endian):
+#   length   uint32   size of the rest of the frame
+#   header   see FRAME_HEADER
+#   peaks    n_peaks * (float32 freq, float32 magnitude)
+#   spectrum n_bins * float32 magnitude
+#   coeffs   float32 a0, n_harmonics * float32 a_n, n_harmonics * float32 b_n
+FRAME_MAGIC = b'ELMS'
+FRAME_VERSION = 1
+FRAME_LENGTH = struct.Struct('<I')
+FRAME_HEADER = struct.Struct('<4sBBHIdffIH')
+
+
+def find_peaks(magnitudes, bin_hz, n_peaks=MAX_PEAKS):
+    """Return the n_peaks strongest local maxima as (freq, magnitude) pairs"""
+    mags = np.asarray(magnitudes, dtype=np.float64)
+    if len(mags) < 3:
+        return np.zeros((0, 2), dtype=np.float32)
+
+    # Local maxima, excluding the DC and Nyquist edges
+    inner = mags[1:-1]
+    is_peak = (inner > mags[:-2]) & (inner >= mags[2:])
+    idx = np.nonzero(is_peak)[0] + 1
+    if len(idx) > n_peaks:
+        idx = idx[np.argsort(mags[idx])[::-1][:n_peaks]]
+    idx = idx[np.argsort(mags[idx])[::-1]]
+
+    peaks = np.empty((len(idx), 2), dtype=np.float32)
+    peaks[:, 0] = idx * bin_hz
+    peaks[:, 1] = mags[idx]
+    return peaks
+
+
+def decimate_spectrum(magnitudes, factor):
+    """Reduce spectrum resolution by taking the max of each group of bins"""
+    mags = np.asarray(magnitudes, dtype=np.float32)
+    if factor <= 1:
+        return mags
+    n = len(mags) // factor * factor
+    groups = mags[:n].reshape(-1, factor).max(axis=1)
+    if n < len(mags):
+        groups = np.append(groups, mags[n:].max())
+    return groups
+
+
+def encode_frame(seq, magnitudes, bin_hz, peaks=None,
+                 fourier_coeffs=None, thd=0.0, timestamp=None):
+    """Pack one analysis frame into the binary wire format"""
+    mags = np.ascontiguousarray(magnitudes, dtype='<f4')
+    if peaks is None:
+        peaks = np.zeros((0, 2), dtype=np.float32)
+    peaks = np.ascontiguousarray(peaks, dtype='<f4')
+
+    a0 = 0.0
+    a_n = b_n = np.zeros(0, dtype='<f4')
+    if fourier_coeffs:
+        a0 = fourier_coeffs.get('a0', 0.0)
+        a_n = np.asarray(fourier_coeffs.get('a_n', []), dtype='<f4')
+        b_n = np.asarray(fourier_coeffs.get('b_n', []), dtype='<f4')
+
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, 0, len(peaks),
+                               seq & 0xFFFFFFFF,
+                               time.time() if timestamp is None else timestamp,
+                               bin_hz, thd, len(mags), len(a_n))
+    body = b''.join([header, peaks.tobytes(), mags.tobytes(),
+                     struct.pack('<f', a0), a_n.tobytes(), b_n.tobytes()])
+    return FRAME_LENGTH.pack(len(body)) + body
+
+
+def decode_frame(body):
+    """Unpack a frame body (without the length prefix) into a dict"""
+    (magic, version, flags, n_peaks, seq, timestamp,
+     bin_hz, thd, n_bins, n_harmonics) = FRAME_HEADER.unpack_from(body, 0)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame {magic!r} v{version}")
+
+    offset = FRAME_HEADER.size
+    peaks = np.frombuffer(body, dtype='<f4', count=n_peaks * 2, offset=offset)
+    offset += peaks.nbytes
+    magnitudes = np.frombuffer(body, dtype='<f4', count=n_bins, offset=offset)
+    offset += magnitudes.nbytes
+    coeffs = np.frombuffer(body, dtype='<f4', count=1 + 2 * n_harmonics, offset=offset)
+
+    return {
+        'seq': seq,
+        'timestamp': timestamp,
+        'bin_hz': bin_hz,
+        'thd': thd,
+        'peaks': peaks.reshape(-1, 2),
+        'magnitudes': magnitudes,
+        'fourier_coeffs': {
+            'a0': float(coeffs[0]),
+            'a_n': coeffs[1:1 + n_harmonics],
+            'b_n': coeffs[1 + n_harmonics:],
+        },
+    }
+
+
+def _recv_exact(sock, n):
+    data = bytearray()
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def _make_socket(address):
+    """Strings are Unix-domain socket paths, tuples are (host, port)"""
+    if isinstance(address, str):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+
+def _is_socket(path):
+    """True if path is an existing Unix-domain socket"""
+    try:
+        return stat.S_ISSOCK(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+class _Subscriber:
+    def __init__(self, conn, queue_size):
+        self.conn = conn
+        self.queue = deque(maxlen=queue_size)
+        self.ready = threading.Condition()
+        self.dropped = 0
+        self.sent = 0
+        self.alive = True
+
+    def push(self, frame):
+        with self.ready:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1  # deque discards the oldest frame
+            self.queue.append(frame)
+            self.ready.notify()
+
+    def close(self):
+        with self.ready:
+            self.alive = False
+            self.ready.notify()
+        # Releases a sendall() blocked on a client that stopped reading
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def run(self):
+        try:
+            while True:
+                with self.ready:
+                    while self.alive and not self.queue:
+                        self.ready.wait()
+                    if not self.alive:
+                        break
+                    frame = self.queue.popleft()
+                self.conn.sendall(frame)
+                self.sent += 1
+        except OSError:
+            pass
+        finally:
+            self.alive = False
+            self.conn.close()
+
+
+class SpectrumPublisher:
+    """Publish analysis frames to every connected subscriber.
+
+    Each subscriber gets its own bounded queue, so a slow dashboard only
+    loses its own oldest frames and never stalls the analysis loop.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, queue_size=QUEUE_SIZE,
+                 spectrum_decimation=1, max_peaks=MAX_PEAKS):
+        self.address = address
+        self.queue_size = queue_size
+        self.spectrum_decimation = max(1, int(spectrum_decimation))
+        self.max_peaks = max_peaks
+        self.subscribers = []
+        self.seq = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._accept_thread = None
+
+    def start(self):
+        """Bind the listening socket and start accepting subscribers"""
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            if not _is_socket(self.address):
+                raise FileExistsError(f"{self.address} exists and is not a socket")
+            os.unlink(self.address)  # Left behind by a previous run
+        self._server = _make_socket(self.address)
+        if not isinstance(self.address, str):
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(self.address)
+        self._server.listen()
+        self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._accept_thread.start()
+        return self
+
+    def stop(self):
+        """Close the listening socket and disconnect all subscribers"""
+        server, self._server = self._server, None
+        if server:
+            # close() alone leaves accept() blocked and the address bound
+            try:
+                server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            server.close()
+        if self._accept_thread is not None:
+            self._accept_thread.join()
+            self._accept_thread = None
+        with self._lock:
+            for sub in self.subscribers:
+                sub.close()
+            self.subscribers = []
+        if isinstance(self.address, str) and _is_socket(self.address):
+            os.unlink(self.address)
+
+    def _accept_loop(self):
+        server = self._server
+        while self._server is server:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                break
+            if self._server is not server:
+                conn.close()  # Connected while stopping
+                break
+            sub = _Subscriber(conn, self.queue_size)
+            with self._lock:
+                self.subscribers.append(sub)
+            threading.Thread(target=sub.run, daemon=True).start()
+
+    def publish(self, magnitudes, sample_rate, fft_size, fourier_coeffs=None, thd=0.0):
+        """Encode one frame and queue it for every subscriber.
+
+        magnitudes is the one-sided magnitude spectrum (bins 0..fft_size/2).
+        Returns the number of subscribers the frame was queued for.
+        """
+        bin_hz = sample_rate / fft_size
+        peaks = find_peaks(magnitudes, bin_hz, self.max_peaks)
+        mags = decimate_spectrum(magnitudes, self.spectrum_decimation)
+
+        frame = encode_frame(self.seq, mags, bin_hz * self.spectrum_decimation,
+                             peaks, fourier_coeffs, thd)
+        self.seq += 1
+
+        with self._lock:
+            self.subscribers = [s for s in self.subscribers if s.alive]
+            for sub in self.subscribers:
+                sub.push(frame)
+            return len(self.subscribers)
+
+    def stats(self):
+        """Per-subscriber sent/dropped frame counts"""
+        with self._lock:
+            return [{'sent': s.sent, 'dropped': s.dropped, 'queued': len(s.queue)}
+                    for s in self.subscribers]
+
+
+def subscribe(address=DEFAULT_ADDRESS):
+    """Connect to a publisher and yield decoded frames until it closes"""
+    sock = _make_socket(address)
+    sock.connect(address)
+    try:
+        while True:
+            prefix = _recv_exact(sock, FRAME_LENGTH.size)
+            if prefix is None:
+                break
+            body = _recv_exact(sock, FRAME_LENGTH.unpack(prefix)[0])
+            if body is None:
+                break
+            yield decode_frame(body)
+    finally:
+        sock.close()
+
+
+def parse_address(text):
+    """'host:port' selects TCP, anything else is a Unix socket path"""
+    host, sep, port = text.rpartition(':')
+    if sep and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return text
+
+
+def main():
+    # Minimal text dashboard: print the peaks of every received frame
+    address = parse_address(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ADDRESS
+    print(f"Subscribing to {address}")
+    try:
+        for frame in subscribe(address):
+            peaks = ", ".join(f"{f:.1f} Hz ({m:.1f})" for f, m in frame['peaks'])
+            print(f"#{frame['seq']} THD {frame['thd']:.1f}% peaks: {peaks}")
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Connection failed: {e}")
+
+if __name__ == "__main__":
+    main()